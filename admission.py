@@ -0,0 +1,210 @@
+"""Admission control for code execution.
+
+Each submission must pass two checks before it may start a sandbox:
+
+1. A per-client token bucket (``rate`` tokens per second, up to ``burst``)
+   caps how fast any one client can submit.
+2. A cap of ``max_in_flight`` running submissions, with a bounded wait
+   queue of ``max_waiting`` submissions. A submission that cannot start
+   within ``wait_timeout`` seconds is refused.
+
+A submission that fails either check raises ``Rejected`` straight away,
+with a ``retry_after`` hint in whole seconds. The caller turns it into
+``429`` with ``Retry-After``, so a burst is answered quickly instead of
+piling up processes.
+
+``AdmissionController`` is for threaded servers and
+``AsyncAdmissionController`` for a single event loop. Both are
+per-process.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+from metrics import registry
+
+SUBMIT_IN_FLIGHT = registry.gauge("submit_in_flight", "Submissions holding a sandbox slot.", ["controller"])
+SUBMIT_WAITING = registry.gauge("submit_waiting", "Submissions waiting for a sandbox slot.", ["controller"])
+SUBMIT_REJECTED = registry.counter(
+    "submit_rejected_total", "Submissions refused with 429, by reason.", ["controller", "reason"]
+)
+
+
+class Rejected(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class TokenBuckets:
+    """Per-client token buckets, bounded to the ``max_clients`` most recently seen clients."""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """Take a token for ``client``; return 0 on success, else seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class _Controller:
+    def __init__(self, name, max_in_flight, max_waiting, wait_timeout, rate, burst):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.buckets = TokenBuckets(rate, burst)
+        self.in_flight = 0
+        self.waiting = 0
+        # Moving average of how long a submission holds its slot, for Retry-After.
+        self.hold_seconds = 1.0
+
+    def _reject(self, reason, retry_after):
+        SUBMIT_REJECTED.inc(controller=self.name, reason=reason)
+        raise Rejected(reason, retry_after)
+
+    def _check_rate(self, client):
+        wait = self.buckets.take(client)
+        if wait:
+            self._reject("rate_limited", wait)
+
+    def _busy_retry_after(self):
+        return self.hold_seconds * (self.waiting / max(self.max_in_flight, 1) + 1)
+
+    def _held(self, seconds):
+        self.hold_seconds = 0.8 * self.hold_seconds + 0.2 * seconds
+
+    def _publish(self):
+        SUBMIT_IN_FLIGHT.set(self.in_flight, controller=self.name)
+        SUBMIT_WAITING.set(self.waiting, controller=self.name)
+
+
+class Ticket:
+    """A held slot. ``release`` is idempotent, so it can be wired to several cleanup paths."""
+
+    def __init__(self, release):
+        self._release = release
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._release(time.monotonic() - self._started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class AdmissionController(_Controller):
+    def __init__(self, max_in_flight, max_waiting, wait_timeout, rate, burst, name="sync"):
+        super().__init__(name, max_in_flight, max_waiting, wait_timeout, rate, burst)
+        self._cond = threading.Condition()
+
+    def admit(self, client):
+        """Return a ``Ticket`` once a slot is free, or raise ``Rejected``."""
+        self._check_rate(client)
+        with self._cond:
+            if self.in_flight >= self.max_in_flight:
+                if self.waiting >= self.max_waiting:
+                    self._reject("queue_full", self._busy_retry_after())
+                self.waiting += 1
+                self._publish()
+                deadline = time.monotonic() + self.wait_timeout
+                try:
+                    while self.in_flight >= self.max_in_flight:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject("wait_timeout", self._busy_retry_after())
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+                    self._publish()
+            self.in_flight += 1
+            self._publish()
+        return Ticket(self._release)
+
+    def _release(self, held):
+        with self._cond:
+            self.in_flight -= 1
+            self._held(held)
+            self._publish()
+            self._cond.notify()
+
+
+class AsyncAdmissionController(_Controller):
+    # Must only be used from one event loop. A released slot is handed to the
+    # oldest waiter directly, so waiters are served in arrival order.
+    def __init__(self, max_in_flight, max_waiting, wait_timeout, rate, burst, name="async"):
+        super().__init__(name, max_in_flight, max_waiting, wait_timeout, rate, burst)
+        self._waiters = deque()
+
+    async def admit(self, client):
+        self._check_rate(client)
+        if self.in_flight >= self.max_in_flight or self._waiters:
+            if len(self._waiters) >= self.max_waiting:
+                self._reject("queue_full", self._busy_retry_after())
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self.waiting = len(self._waiters)
+            self._publish()
+            try:
+                await asyncio.wait_for(waiter, self.wait_timeout)
+            except asyncio.TimeoutError:
+                if not self._handed_over(waiter):
+                    self._reject("wait_timeout", self._busy_retry_after())
+            except asyncio.CancelledError:
+                if self._handed_over(waiter):
+                    self._free_slot()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self.waiting = len(self._waiters)
+                self._publish()
+        else:
+            self.in_flight += 1
+            self._publish()
+        return Ticket(self._release)
+
+    @staticmethod
+    def _handed_over(waiter):
+        return waiter.done() and not waiter.cancelled()
+
+    def _release(self, held):
+        self._held(held)
+        self._free_slot()
+
+    def _free_slot(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # The slot passes to the waiter; in_flight is unchanged.
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+        self._publish()
@@ -0,0 +1,114 @@
+"""Time-bucketed rollups over coding and design results.
+
+Every stored result is folded into one rollup row per granularity (hour, day
+and week), keyed on the bucket start and the problem or question id. Attempt
+latencies are kept as a fixed-bound histogram so percentiles can be estimated
+from the rollups alone, without touching the raw result rows.
+"""
+from datetime import datetime, timedelta, timezone
+
+GRANULARITIES = ("hour", "day", "week")
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket
+# collects everything slower than the final bound.
+LATENCY_BOUNDS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# How far back the analytics endpoint looks when no ``since`` is given.
+DEFAULT_WINDOWS = {
+    "hour": timedelta(days=2),
+    "day": timedelta(days=30),
+    "week": timedelta(weeks=26),
+}
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_start(ts, granularity):
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    day = ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def empty_histogram():
+    return [0] * (len(LATENCY_BOUNDS) + 1)
+
+
+def latency_bucket(seconds):
+    for i, bound in enumerate(LATENCY_BOUNDS):
+        if seconds <= bound:
+            return i
+    return len(LATENCY_BOUNDS)
+
+
+def merge_histograms(into, other):
+    for i, count in enumerate(other):
+        into[i] += count
+    return into
+
+
+def merge_delta(into, delta):
+    for field, value in delta.items():
+        if field == "latency_hist":
+            merge_histograms(into[field], value)
+        else:
+            into[field] += value
+    return into
+
+
+def histogram_percentile(hist, q):
+    """Estimate the ``q`` quantile (0-1) by interpolating inside its bucket."""
+    total = sum(hist)
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for i, count in enumerate(hist):
+        if count and seen + count >= rank:
+            lower = LATENCY_BOUNDS[i - 1] if i > 0 else 0.0
+            upper = LATENCY_BOUNDS[i] if i < len(LATENCY_BOUNDS) else LATENCY_BOUNDS[-1]
+            return lower + (upper - lower) * ((rank - seen) / count)
+        seen += count
+    return LATENCY_BOUNDS[-1]
+
+
+def coding_deltas(rows):
+    """Fold coding result rows into ``{(granularity, bucket, problem_id): delta}``."""
+    deltas = {}
+    for row in rows:
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(row["created_at"], granularity), row["problem_id"])
+            delta = deltas.get(key)
+            if delta is None:
+                delta = deltas[key] = {
+                    "attempts": 0, "solved": 0, "passed_cases": 0, "total_cases": 0,
+                    "time_sum": 0.0, "latency_hist": empty_histogram()
+                }
+            passed = row.get("passed") or 0
+            total = row.get("total") or 0
+            elapsed = row.get("execution_time") or 0.0
+            delta["attempts"] += 1
+            delta["solved"] += 1 if total and passed == total else 0
+            delta["passed_cases"] += passed
+            delta["total_cases"] += total
+            delta["time_sum"] += elapsed
+            delta["latency_hist"][latency_bucket(elapsed)] += 1
+    return deltas
+
+
+def design_deltas(rows):
+    """Fold design result rows into ``{(granularity, bucket, question_id): delta}``."""
+    deltas = {}
+    for row in rows:
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(row["created_at"], granularity), row["question_id"])
+            delta = deltas.setdefault(key, {"attempts": 0, "score_sum": 0})
+            delta["attempts"] += 1
+            delta["score_sum"] += row.get("score") or 0
+    return deltas
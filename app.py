@@ -1,25 +1,113 @@
+import hmac
 import json
-import subprocess
 import os
-import tempfile
+import random
+import threading
 import time
-from flask import Flask, request, redirect, url_for, render_template_string, abort, jsonify
+import click
+from flask import Flask, Response as HTTPResponse, g, has_request_context, request, redirect, url_for, render_template, abort, jsonify, stream_with_context
+from flask.cli import AppGroup
 from flask_sqlalchemy import SQLAlchemy
+from jinja2 import DictLoader, FileSystemBytecodeCache
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlite3 import connect, Error
 from flasgger import Swagger # type: ignore
+from datetime import datetime, timedelta, timezone
 from uuid import uuid4
+import analytics
+from sandbox import execute_user_code, iter_user_code
+from sandbox_pool import SandboxPool, SandboxUnavailable
+from admission import AdmissionController, Rejected
+from caching import LRUCache
+from metrics import MultiprocessCollector, registry
+from profiling import ProfileStore, RequestProfile
+from diagram_store import DiagramStore, PatchError, VersionConflict
+from result_recorder import ResultRecorder
+from scoring import Rubric
+from search import SearchIndex
+from specs import EncodedSpec, check_contract, load_contract
+from retention import RetentionWorker, incremental_vacuum
+from traffic import TrafficRecorder
 
 
 app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(app.instance_path, "diagnostics.db")
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get(
+    "DATABASE_URL", "sqlite:///" + os.path.join(app.instance_path, "diagnostics.db")
+)
+# Write-behind buffering of scoring rows (see result_recorder.py). Off by default.
+app.config["RESULT_WRITE_BEHIND"] = os.environ.get("RESULT_WRITE_BEHIND", "0") == "1"
+app.config["RESULT_BUFFER_MAX_PENDING"] = int(os.environ.get("RESULT_BUFFER_MAX_PENDING", "10000"))
+app.config["RESULT_BUFFER_BATCH_SIZE"] = int(os.environ.get("RESULT_BUFFER_BATCH_SIZE", "500"))
+app.config["RESULT_BUFFER_FLUSH_INTERVAL"] = float(os.environ.get("RESULT_BUFFER_FLUSH_INTERVAL", "1.0"))
+# Result retention (see retention.py). RESULT_RETENTION_DAYS=0 keeps every row in the hot tables.
+app.config["RESULT_RETENTION_DAYS"] = int(os.environ.get("RESULT_RETENTION_DAYS", "0"))
+app.config["RESULT_RETENTION_INTERVAL"] = float(os.environ.get("RESULT_RETENTION_INTERVAL", "300"))
+app.config["RESULT_RETENTION_BATCH_SIZE"] = int(os.environ.get("RESULT_RETENTION_BATCH_SIZE", "5000"))
+app.config["RESULT_RETENTION_VACUUM_PAGES"] = int(os.environ.get("RESULT_RETENTION_VACUUM_PAGES", "1000"))
+# Diagram history: write a full snapshot every N patches and keep the last M snapshots.
+app.config["DIAGRAM_SNAPSHOT_EVERY"] = int(os.environ.get("DIAGRAM_SNAPSHOT_EVERY", "50"))
+app.config["DIAGRAM_KEEP_SNAPSHOTS"] = int(os.environ.get("DIAGRAM_KEEP_SNAPSHOTS", "2"))
+# Parsed diagram cache. Entries are revalidated against the head version after the TTL
+# so saves made by other worker processes are picked up.
+app.config["DIAGRAM_CACHE_ENTRIES"] = int(os.environ.get("DIAGRAM_CACHE_ENTRIES", "256"))
+app.config["DIAGRAM_CACHE_BYTES"] = int(os.environ.get("DIAGRAM_CACHE_BYTES", str(64 * 1024 * 1024)))
+app.config["DIAGRAM_CACHE_TTL"] = float(os.environ.get("DIAGRAM_CACHE_TTL", "2.0"))
+# Seconds between checks of diagnostic_data.json for changes.
+app.config["PROBLEM_BANK_CHECK_INTERVAL"] = float(os.environ.get("PROBLEM_BANK_CHECK_INTERVAL", "1.0"))
+# Request trace capture for load testing (see traffic.py and benchmarks/replay.py). Off by default.
+app.config["TRAFFIC_CAPTURE"] = os.environ.get("TRAFFIC_CAPTURE", "0") == "1"
+app.config["TRAFFIC_CAPTURE_PATH"] = os.environ.get(
+    "TRAFFIC_CAPTURE_PATH", os.path.join(app.instance_path, "requests.jsonl")
+)
+app.config["TRAFFIC_CAPTURE_SAMPLE"] = float(os.environ.get("TRAFFIC_CAPTURE_SAMPLE", "1.0"))
+# On-demand profiling (see profiling.py). Requests carrying X-Profile-Token: <PROFILE_TOKEN>
+# are profiled, as is a PROFILE_SAMPLE_RATE fraction of all requests.
+app.config["PROFILE_TOKEN"] = os.environ.get("PROFILE_TOKEN", "")
+app.config["PROFILE_SAMPLE_RATE"] = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+app.config["PROFILE_DIR"] = os.environ.get("PROFILE_DIR", os.path.join(app.instance_path, "profiles"))
+app.config["PROFILE_KEEP"] = int(os.environ.get("PROFILE_KEEP", "50"))
+# Admission control for code execution (see admission.py): at most SUBMIT_MAX_IN_FLIGHT
+# submissions run per process, SUBMIT_MAX_WAITING more may wait up to SUBMIT_WAIT_TIMEOUT
+# seconds, and each client gets SUBMIT_RATE submissions per second (bursts of SUBMIT_BURST).
+# Clients are identified by remote address, or by SUBMIT_CLIENT_HEADER behind a trusted proxy.
+app.config["SUBMIT_MAX_IN_FLIGHT"] = int(os.environ.get("SUBMIT_MAX_IN_FLIGHT", str(os.cpu_count() or 2)))
+app.config["SUBMIT_MAX_WAITING"] = int(os.environ.get("SUBMIT_MAX_WAITING", "32"))
+app.config["SUBMIT_WAIT_TIMEOUT"] = float(os.environ.get("SUBMIT_WAIT_TIMEOUT", "10"))
+# Per-client limiting is off (0) by default. Behind a proxy or load balancer every request
+# shares its address, so only enable it together with SUBMIT_CLIENT_HEADER there.
+app.config["SUBMIT_RATE"] = float(os.environ.get("SUBMIT_RATE", "0"))
+app.config["SUBMIT_BURST"] = float(os.environ.get("SUBMIT_BURST", "10"))
+app.config["SUBMIT_CLIENT_HEADER"] = os.environ.get("SUBMIT_CLIENT_HEADER", "")
+# Remote sandbox workers (see sandbox_worker.py): comma-separated unix:/path or host:port
+# addresses. When empty, submissions run in subprocesses of the API process.
+app.config["SANDBOX_WORKERS"] = [a.strip() for a in os.environ.get("SANDBOX_WORKERS", "").split(",") if a.strip()]
+app.config["SANDBOX_LEASE_TIMEOUT"] = float(os.environ.get("SANDBOX_LEASE_TIMEOUT", "10"))
+app.config["SANDBOX_MAX_ATTEMPTS"] = int(os.environ.get("SANDBOX_MAX_ATTEMPTS", "3"))
+app.config["SANDBOX_WORKER_TOKEN"] = os.environ.get("SANDBOX_WORKER_TOKEN", "")
+# Directory shared by the worker processes of a prefork server, so /metrics reports totals
+# across all of them (see metrics.py). serve.py sets it; unset, /metrics covers this process.
+app.config["METRICS_DIR"] = os.environ.get("METRICS_DIR", "")
+# Prebuilt OpenAPI spec written by `flask spec build`; generated at startup when unset or missing.
+app.config["APISPEC_FILE"] = os.environ.get("APISPEC_FILE", "")
 db = SQLAlchemy(app)
 Model = db.Model
 
+traffic_recorder = None
+if app.config["TRAFFIC_CAPTURE"]:
+    traffic_recorder = TrafficRecorder(
+        app.wsgi_app, app.config["TRAFFIC_CAPTURE_PATH"], sample_rate=app.config["TRAFFIC_CAPTURE_SAMPLE"]
+    )
+    app.wsgi_app = traffic_recorder
+
 ########################################################
 # 0. Minimal Templates (Inline for Demo)
 ########################################################
 # Configuration
-DATA_FILE = 'diagnostic_data.json'
+DATA_FILE = os.environ.get('DIAGNOSTIC_DATA_FILE', 'diagnostic_data.json')
+SEED_FILE = 'seed_data.json'
+OPENAPI_FILE = 'openapi.yaml'
 DATABASE = 'diagnostics.db'
 
 TEMPLATES = {
@@ -32,6 +120,11 @@ TEMPLATES = {
 <body>
   <h1>Welcome to the System Design Wizard</h1>
   <p>Pick a scenario to begin:</p>
+  {{ scenario_list }}
+</body>
+</html>
+""",
+    "scenario_list": """
   <ul>
     {% for sc in scenarios %}
       <li>
@@ -41,8 +134,6 @@ TEMPLATES = {
       </li>
     {% endfor %}
   </ul>
-</body>
-</html>
 """,
     "step": """
 <!DOCTYPE html>
@@ -88,6 +179,17 @@ TEMPLATES = {
 """
 }
 
+# Serve TEMPLATES through the app's Jinja environment with an on-disk bytecode
+# cache; the ".html" names keep autoescaping on.
+os.makedirs(os.path.join(app.instance_path, "jinja_cache"), exist_ok=True)
+app.jinja_options = {
+    **app.jinja_options,
+    "bytecode_cache": FileSystemBytecodeCache(os.path.join(app.instance_path, "jinja_cache"))
+}
+app.jinja_loader = DictLoader({f"{name}.html": source for name, source in TEMPLATES.items()})
+for template_name in TEMPLATES:
+    app.jinja_env.get_template(f"{template_name}.html")
+
 ########################################################
 # 1. Models (SQLAlchemy)
 ########################################################
@@ -114,6 +216,8 @@ class Response(db.Model): # type: ignore
     scenario_id = db.Column(db.Integer, nullable=False)
     step_id = db.Column(db.Integer, db.ForeignKey("steps.id"), nullable=False)
     user_response_text = db.Column(db.Text)
+    # Bumped on every edit so stale rubric scores can be found.
+    revision = db.Column(db.Integer, default=0)
 
 # New models for coding and design results
 class CodingResult(db.Model): # type: ignore
@@ -123,183 +227,503 @@ class CodingResult(db.Model): # type: ignore
     passed = db.Column(db.Integer, default=0)
     total = db.Column(db.Integer, default=0)
     execution_time = db.Column(db.Float, default=0.0)
+    created_at = db.Column(db.DateTime, default=analytics.utcnow, index=True)
 
 class DesignResult(db.Model): # type: ignore
     __tablename__ = "design_results"
     id = db.Column(db.Integer, primary_key=True)
     question_id = db.Column(db.String(200), nullable=False)
     score = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=analytics.utcnow, index=True)
+
+# Diagram history (see diagram_store.py): full snapshots plus JSON Patch deltas
+class DiagramVersion(db.Model): # type: ignore
+    __tablename__ = "diagram_versions"
+    __table_args__ = (db.UniqueConstraint("scenario_id", "version"),)
+    id = db.Column(db.Integer, primary_key=True)
+    scenario_id = db.Column(db.Integer, nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(8), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=analytics.utcnow)
+
+# Compact per-day archive of result rows moved out of the hot tables by retention
+class CodingResultArchive(db.Model): # type: ignore
+    __tablename__ = "coding_results_archive"
+    __table_args__ = (db.UniqueConstraint("day", "problem_id"),)
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.DateTime, nullable=False)
+    problem_id = db.Column(db.String(200), nullable=False)
+    attempts = db.Column(db.Integer, default=0)
+    passed = db.Column(db.Integer, default=0)
+    total = db.Column(db.Integer, default=0)
+    time_sum = db.Column(db.Float, default=0.0)
+    solved = db.Column(db.Integer, default=0)
+    latency_hist = db.Column(db.Text)
+
+class DesignResultArchive(db.Model): # type: ignore
+    __tablename__ = "design_results_archive"
+    __table_args__ = (db.UniqueConstraint("day", "question_id"),)
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.DateTime, nullable=False)
+    question_id = db.Column(db.String(200), nullable=False)
+    attempts = db.Column(db.Integer, default=0)
+    score_sum = db.Column(db.Integer, default=0)
+
+# Pre-aggregated rollups (see analytics.py), one row per granularity, bucket and problem/question
+class CodingRollup(db.Model): # type: ignore
+    __tablename__ = "coding_rollups"
+    __table_args__ = (db.UniqueConstraint("granularity", "bucket_start", "problem_id"),)
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(8), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    problem_id = db.Column(db.String(200), nullable=False)
+    attempts = db.Column(db.Integer, default=0)
+    solved = db.Column(db.Integer, default=0)
+    passed_cases = db.Column(db.Integer, default=0)
+    total_cases = db.Column(db.Integer, default=0)
+    time_sum = db.Column(db.Float, default=0.0)
+    latency_hist = db.Column(db.Text)
+
+class DesignRollup(db.Model): # type: ignore
+    __tablename__ = "design_rollups"
+    __table_args__ = (db.UniqueConstraint("granularity", "bucket_start", "question_id"),)
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(8), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    question_id = db.Column(db.String(200), nullable=False)
+    attempts = db.Column(db.Integer, default=0)
+    score_sum = db.Column(db.Integer, default=0)
+
+# Rubric scores of wizard responses (see scoring.py), one row per response and competency
+class ResponseScore(db.Model): # type: ignore
+    __tablename__ = "response_scores"
+    response_id = db.Column(db.Integer, db.ForeignKey("responses.id"), primary_key=True)
+    competency = db.Column(db.String(100), primary_key=True)
+    revision = db.Column(db.Integer, nullable=False)
+    rubric_version = db.Column(db.String(40), nullable=False)
+    level = db.Column(db.Integer, default=0)
+    score = db.Column(db.Float, default=0.0)
+    coverage = db.Column(db.Float, default=0.0)
+    skills = db.Column(db.Text)
 
 ########################################################
-# 2. CORS and Database Initialization
+# 2. CORS and Database CLI
 ########################################################
 
 @app.after_request
 def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
-    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Profile-Token')
+    response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,PATCH,POST,DELETE,OPTIONS')
+    return response
+
+metrics_collector = None
+if app.config["METRICS_DIR"]:
+    metrics_collector = MultiprocessCollector(registry, app.config["METRICS_DIR"])
+    metrics_collector.start()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "Requests served, by route and status.", ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "Time to produce a response (streamed bodies excluded).", ["method", "route"]
+)
+HTTP_REQUEST_DB_QUERIES = registry.histogram(
+    "http_request_db_queries", "SQL statements executed per request.", ["method", "route"],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100, 250)
+)
+HTTP_REQUEST_DB_SECONDS = registry.histogram(
+    "http_request_db_seconds", "Time spent in SQL statements per request.", ["method", "route"]
+)
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_seconds", "SQL statement latency, including background writers.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+
+def observe_request(method, route, status, duration, db_queries=0, db_seconds=0.0):
+    HTTP_REQUESTS.inc(method=method, route=route, status=status)
+    HTTP_REQUEST_SECONDS.observe(duration, method=method, route=route)
+    HTTP_REQUEST_DB_QUERIES.observe(db_queries, method=method, route=route)
+    HTTP_REQUEST_DB_SECONDS.observe(db_seconds, method=method, route=route)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    DB_QUERY_SECONDS.observe(elapsed)
+    if has_request_context():
+        g.db_queries = g.get("db_queries", 0) + 1
+        g.db_seconds = g.get("db_seconds", 0.0) + elapsed
+        if "profile" in g:
+            g.profile.add_query(statement, elapsed)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    if "request_start" in g:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        observe_request(
+            request.method, route, response.status_code, time.perf_counter() - g.request_start,
+            g.get("db_queries", 0), g.get("db_seconds", 0.0)
+        )
     return response
 
-first_request_done = False
+profile_store = ProfileStore(app.config["PROFILE_DIR"], keep=app.config["PROFILE_KEEP"])
+PROFILE_ENDPOINTS = {"list_profiles", "get_profile"}
+
+def has_admin_token():
+    token = app.config["PROFILE_TOKEN"]
+    # compare_digest only accepts ASCII str, so compare bytes.
+    header = request.headers.get("X-Profile-Token", "")
+    return bool(token) and hmac.compare_digest(header.encode("utf-8", "surrogateescape"), token.encode())
 
 @app.before_request
-def setup_db_once():
-    global first_request_done
-    if first_request_done:
+def start_profile():
+    if request.endpoint in PROFILE_ENDPOINTS:
         return
-    with app.app_context():
-        # Create all tables (delete diagnostics.db if necessary)
-        db.create_all()
-        if not Scenario.query.first():
-            # Scenario 1: Yelp-like Service
-            scenario1 = Scenario(
-                title="Design a Yelp-like Service",
-                description=("Walk through major design aspects of building a Yelp-like platform. "
-                             "Consider requirements, architecture, data modeling, scalability, "
-                             "availability, security, and overall trade-offs.")
-            )
-            db.session.add(scenario1)
-            db.session.commit()
+    requested = has_admin_token()
+    rate = app.config["PROFILE_SAMPLE_RATE"]
+    if not requested and not (rate > 0 and random.random() < rate):
+        return
+    profile = RequestProfile()
+    try:
+        profile.start()
+    except ValueError as e:
+        # Another profiler is already running in this thread.
+        print(f"Error starting profiler: {e}")
+        return
+    g.profile = profile
+    g.profile_requested = requested
 
-            steps_data1 = [
-                (1, "Requirements Gathering", "List key functional and non-functional requirements for a Yelp-like service. Consider user reviews, business search, and location-based filtering."),
-                (2, "High-Level Architecture", "Outline your core architecture. Will you use a monolithic approach or microservices? What are the main components?"),
-                (3, "Data Modeling & Storage", "What database(s) will you use? How will you model business, user, and review data? Discuss schema design and indexing strategies."),
-                (4, "Scalability & Performance", "How will you handle high traffic? Consider caching, replication, and load balancing to support 10x traffic growth."),
-                (5, "Availability & Fault Tolerance", "Discuss strategies for failover, redundancy, and disaster recovery in case of data center failures."),
-                (6, "Security & Access Control", "How will you secure user data, enforce authentication, and protect against abuse or spam?"),
-                (7, "Summary", "Summarize your design, highlight trade-offs, and note potential improvements.")
-            ]
-            for step_num, title, prompt in steps_data1:
-                step_obj = Step(
-                    scenario_id=scenario1.id, # type: ignore
-                    step_number=step_num,
-                    title=title,
-                    prompt_text=prompt
-                )
-                db.session.add(step_obj)
-            db.session.commit()
+def finish_profile(profile, details, profile_id=None):
+    profile.stop()
+    try:
+        return profile_store.save(profile, details, profile_id)
+    except OSError as e:
+        print(f"Error saving profile: {e}")
 
-            # Scenario 2: E-commerce Platform
-            scenario2 = Scenario(
-                title="Design an E-commerce Platform",
-                description=("Design a robust e-commerce platform that handles product listings, user accounts, "
-                             "shopping carts, payments, and order fulfillment. Consider scalability, security, and performance.")
-            )
-            db.session.add(scenario2)
-            db.session.commit()
+@app.after_request
+def save_profile(response):
+    if "profile" not in g:
+        return response
+    details = {
+        "method": request.method,
+        "path": request.path,
+        "query": request.query_string.decode(errors="replace"),
+        "route": request.url_rule.rule if request.url_rule else None,
+        "status": response.status_code,
+        "sampled": not g.get("profile_requested"),
+    }
+    if response.is_streamed:
+        # The body has not run yet; keep profiling (and collecting SQL)
+        # until the server closes the response.
+        profile = g.profile
+        g.profile_streaming = True
+        profile_id = profile_store.new_id()
+        response.call_on_close(lambda: finish_profile(profile, details, profile_id))
+    else:
+        profile_id = finish_profile(g.pop("profile"), details)
+    if profile_id and g.get("profile_requested"):
+        response.headers["X-Profile-Id"] = profile_id
+    return response
 
-            steps_data2 = [
-                (1, "Requirements", "List the core functional and non-functional requirements for an e-commerce platform."),
-                (2, "User & Product Data Modeling", "Describe how you would model user profiles, product catalogs, orders, and reviews."),
-                (3, "High-Level System Architecture", "Outline the overall architecture including frontend, backend, and integrations with third-party services."),
-                (4, "Scalability Strategies", "Discuss how you would scale the platform to handle increasing traffic and large data volumes."),
-                (5, "Security Considerations", "What measures would you implement to ensure secure transactions and data protection?"),
-                (6, "Deployment & Monitoring", "Explain your deployment strategy and how you would monitor the system in production."),
-                (7, "Summary & Trade-offs", "Summarize your design decisions, highlighting trade-offs and potential future improvements.")
-            ]
-            for step_num, title, prompt in steps_data2:
-                step_obj = Step(
-                    scenario_id=scenario2.id, # type: ignore
-                    step_number=step_num,
-                    title=title,
-                    prompt_text=prompt
-                )
-                db.session.add(step_obj)
-            db.session.commit()
+@app.teardown_request
+def discard_profile(exc):
+    # Only reached with a running profiler if the response was never finalized.
+    if g.get("profile_streaming"):
+        return
+    profile = g.pop("profile", None)
+    if profile is not None:
+        profile.stop()
 
-            # Scenario 3: Social Media Platform
-            scenario3 = Scenario(
-                title="Design a Social Media Platform",
-                description=("Design a scalable social media platform where users can create profiles, share content, "
-                             "and engage with a community. Consider real-time feeds, content moderation, privacy, and data storage.")
-            )
-            db.session.add(scenario3)
-            db.session.commit()
+db_cli = AppGroup("db", help="Create the schema and load seed data.")
+app.cli.add_command(db_cli)
 
-            steps_data3 = [
-                (1, "User Features", "List the core user features such as profile creation, posting, commenting, and sharing."),
-                (2, "Content Feed Generation", "Describe how user feeds will be generated in real time with personalization."),
-                (3, "Data Storage Strategy", "Explain your choice of databases (SQL vs. NoSQL) for storing posts, media, and profiles. Consider caching and sharding."),
-                (4, "Real-Time Communication", "Outline how you would implement real-time updates and notifications (e.g., using WebSockets)."),
-                (5, "Content Moderation", "Discuss automated filters and manual review processes for moderating user content."),
-                (6, "Privacy and Security", "Detail measures to protect user data including encryption, access controls, and anonymization."),
-                (7, "Summary", "Summarize your design and discuss trade-offs between scalability, performance, and privacy.")
-            ]
-            for step_num, title, prompt in steps_data3:
-                step_obj = Step(
-                    scenario_id=scenario3.id, # type: ignore
-                    step_number=step_num,
-                    title=title,
-                    prompt_text=prompt
-                )
-                db.session.add(step_obj)
-            db.session.commit()
+def load_seed_data(path=SEED_FILE):
+    with open(path, 'r') as f:
+        return json.load(f)
 
-            # Scenario 4: Real-Time Chat Application
-            scenario4 = Scenario(
-                title="Design a Real-Time Chat Application",
-                description=("Design a real-time chat application that supports one-on-one and group conversations. "
-                             "Consider message delivery, persistence, user presence, and security challenges.")
-            )
-            db.session.add(scenario4)
-            db.session.commit()
+def scenario_data_version():
+    # Bumped by every seed load; keys caches of scenario data across processes.
+    return db.session.execute(db.text("PRAGMA user_version")).scalar()
 
-            steps_data4 = [
-                (1, "Core Messaging Features", "List essential features such as direct messaging, group chat, and read receipts."),
-                (2, "Real-Time Communication", "Describe how messages are delivered instantly, for example, via WebSockets or long polling."),
-                (3, "Message Persistence", "Explain how you would store chat history and user data, including database choices and indexing strategies."),
-                (4, "Scalability", "Discuss strategies for scaling to millions of users, including load balancing and sharding."),
-                (5, "Security", "Outline measures for data encryption, authentication, and spam/abuse prevention."),
-                (6, "User Presence & Notifications", "Detail how you would implement presence detection and notification mechanisms."),
-                (7, "Summary", "Summarize your architecture and discuss trade-offs between real-time performance and scalability.")
-            ]
-            for step_num, title, prompt in steps_data4:
-                step_obj = Step(
-                    scenario_id=scenario4.id, # type: ignore
-                    step_number=step_num,
-                    title=title,
-                    prompt_text=prompt
-                )
-                db.session.add(step_obj)
-            db.session.commit()
+def seed_scenarios(seed):
+    # One transaction for the whole load: scenario ids come from the seed file,
+    # so steps can reference them without flushing scenarios first.
+    scenario_rows = []
+    step_rows = []
+    for sc in seed.get('scenarios', []):
+        scenario_rows.append({"id": sc["id"], "title": sc["title"], "description": sc.get("description")})
+        for st in sc.get('steps', []):
+            step_rows.append({
+                "scenario_id": sc["id"],
+                "step_number": st["step_number"],
+                "title": st["title"],
+                "prompt_text": st.get("prompt_text")
+            })
+    try:
+        if scenario_rows:
+            db.session.execute(db.insert(Scenario), scenario_rows)
+        if step_rows:
+            db.session.execute(db.insert(Step), step_rows)
+        db.session.execute(db.text(f"PRAGMA user_version = {scenario_data_version() + 1}"))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(scenario_rows), len(step_rows)
 
-            # Scenario 5: Scalable Video Streaming Service
-            scenario5 = Scenario(
-                title="Design a Scalable Video Streaming Service",
-                description=(
-                  "Design a video streaming service that can handle live and on-demand content. "
-                             "Consider video encoding, content delivery networks (CDNs), scalability, latency, and user experience."
-                             )
-            )
-            db.session.add(scenario5)
-            db.session.commit()
+def upgrade_schema():
+    # create_all() only creates missing tables; add columns (and their indexes)
+    # that were introduced after an existing database was created.
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    col_type = column.type.compile(dialect=db.engine.dialect)
+                    conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    if db.engine.dialect.name == "sqlite":
+        with db.engine.connect() as conn:
+            # Incremental auto-vacuum lets retention hand freed pages back in
+            # small steps; switching an existing file needs one full VACUUM.
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+                conn.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+                conn.exec_driver_sql("VACUUM")
+
+def init_schema():
+    os.makedirs(app.instance_path, exist_ok=True)
+    db.create_all()
+    upgrade_schema()
+
+# Both steps are no-ops on an up-to-date database, so every start (and every
+# preloaded gunicorn master) brings an older file up to the current schema.
+with app.app_context():
+    init_schema()
 
-            steps_data5 = [
-                (1, "User Experience", "Define features for both viewers and content creators, such as live streaming, VOD, and recommendations."),
-                (2, "Video Processing Pipeline", "Explain how videos are ingested, transcoded, and processed for multiple resolutions."),
-                (3, "Content Delivery Strategy", "Discuss how CDNs and caching are used to reduce latency and ensure high availability."),
-                (4, "Scalability", "Detail strategies to handle high concurrent viewers and traffic spikes."),
-                (5, "Data Storage", "Outline how video files, metadata, and user data are stored, including trade-offs between different storage solutions."),
-                (6, "Security & DRM", "Describe measures for protecting content, including DRM and encryption."),
-                (7, "Summary", "Summarize your design, focusing on trade-offs between cost, performance, and scalability.")
-            ]
-            for step_num, title, prompt in steps_data5:
-                step_obj = Step(
-                    scenario_id=scenario5.id, # type: ignore
-                    step_number=step_num,
-                    title=title,
-                    prompt_text=prompt
-                )
-                db.session.add(step_obj)
+@db_cli.command("init")
+def db_init_command():
+    """Create missing tables and add missing columns."""
+    init_schema()
+    click.echo("Database schema is up to date.")
+
+@db_cli.command("seed")
+@click.option("--file", "path", default=SEED_FILE, show_default=True, help="Declarative seed data file.")
+@click.option("--replace", is_flag=True, help="Delete existing scenarios and steps before loading.")
+def db_seed_command(path, replace):
+    """Bulk-load wizard scenarios and steps in a single transaction."""
+    seed = load_seed_data(path)
+    if replace:
+        Step.query.delete()
+        Scenario.query.delete()
+    elif Scenario.query.first():
+        click.echo("Scenarios already present; use --replace to reload them.")
+        return
+    scenarios, steps = seed_scenarios(seed)
+    click.echo(f"Loaded {scenarios} scenarios and {steps} steps.")
+
+def apply_rollups(model, rows):
+    # Runs inside the transaction that inserts ``rows`` so rollups never drift
+    # from the raw tables.
+    if model is CodingResult:
+        deltas, rollup_model, key_column = analytics.coding_deltas(rows), CodingRollup, "problem_id"
+    elif model is DesignResult:
+        deltas, rollup_model, key_column = analytics.design_deltas(rows), DesignRollup, "question_id"
+    else:
+        return
+    for (granularity, bucket, key), delta in deltas.items():
+        rollup = rollup_model.query.filter_by(granularity=granularity, bucket_start=bucket, **{key_column: key}).first()
+        if rollup is None:
+            rollup = rollup_model(granularity=granularity, bucket_start=bucket, **{key_column: key})
+            db.session.add(rollup)
+        for field, value in delta.items():
+            if field == "latency_hist":
+                hist = json.loads(rollup.latency_hist) if rollup.latency_hist else analytics.empty_histogram()
+                rollup.latency_hist = json.dumps(analytics.merge_histograms(hist, value))
+            else:
+                setattr(rollup, field, (getattr(rollup, field) or 0) + value)
+
+result_recorder = None
+if app.config["RESULT_WRITE_BEHIND"]:
+    result_recorder = ResultRecorder(
+        app, db,
+        max_pending=app.config["RESULT_BUFFER_MAX_PENDING"],
+        batch_size=app.config["RESULT_BUFFER_BATCH_SIZE"],
+        flush_interval=app.config["RESULT_BUFFER_FLUSH_INTERVAL"],
+        on_flush=apply_rollups
+    )
+
+def store_results(model, rows):
+    if not rows:
+        return
+    now = analytics.utcnow()
+    for row in rows:
+        row.setdefault('created_at', now)
+    if result_recorder is not None and result_recorder.record(model, rows):
+        return
+    db.session.add_all([model(**row) for row in rows])
+    apply_rollups(model, rows)
+    db.session.commit()
+
+registry.gauge(
+    "result_queue_depth", "Result rows waiting in the write-behind buffer.",
+    callback=lambda: result_recorder.pending() if result_recorder is not None else 0
+)
+
+def rebuild_rollups(model, archive_model, rollup_model, key_column, columns, fold, archived_delta):
+    # Rows archived by retention are gone from ``model``, so buckets they fed
+    # cannot be recomputed from it. Hour and day buckets before the end of
+    # the newest archived day are kept as they are. The week containing that
+    # point is rebuilt from the hot rows plus that week's archive days.
+    newest = db.session.scalar(db.select(db.func.max(archive_model.day)))
+    query = db.select(*columns).where(model.created_at.is_not(None))
+    stale = db.delete(rollup_model)
+    if newest is None:
+        end = week = None
+    else:
+        end = newest + timedelta(days=1)
+        week = analytics.bucket_start(end, "week")
+        query = query.where(model.created_at >= week)
+    deltas = fold(db.session.execute(query.execution_options(yield_per=5000)).mappings())
+    if end is not None:
+        deltas = {k: d for k, d in deltas.items() if k[0] == "week" or k[1] >= end}
+        for archived in archive_model.query.filter(archive_model.day >= week, archive_model.day < end):
+            key = getattr(archived, key_column)
+            delta = archived_delta(archived)
+            total = deltas.get(("week", week, key))
+            if total is None:
+                deltas[("week", week, key)] = delta
+            else:
+                analytics.merge_delta(total, delta)
+        stale = stale.where(db.or_(
+            db.and_(rollup_model.granularity != "week", rollup_model.bucket_start >= end),
+            db.and_(rollup_model.granularity == "week", rollup_model.bucket_start >= week),
+        ))
+    db.session.execute(stale)
+    if deltas:
+        rows = []
+        for (granularity, bucket, key), delta in deltas.items():
+            row = dict(delta, granularity=granularity, bucket_start=bucket, **{key_column: key})
+            if "latency_hist" in row:
+                row["latency_hist"] = json.dumps(row["latency_hist"])
+            rows.append(row)
+        db.session.execute(db.insert(rollup_model), rows)
+    return len(deltas)
+
+def archived_coding_delta(archived):
+    return {
+        "attempts": archived.attempts or 0, "solved": archived.solved or 0, "passed_cases": archived.passed or 0,
+        "total_cases": archived.total or 0, "time_sum": archived.time_sum or 0.0,
+        "latency_hist": json.loads(archived.latency_hist)
+    }
+
+def archived_design_delta(archived):
+    return {"attempts": archived.attempts or 0, "score_sum": archived.score_sum or 0}
+
+@db_cli.command("rebuild-rollups")
+def db_rebuild_rollups_command():
+    """Recompute the analytics rollups from the raw result and archive tables."""
+    coding = rebuild_rollups(
+        CodingResult, CodingResultArchive, CodingRollup, "problem_id",
+        (CodingResult.problem_id, CodingResult.passed, CodingResult.total,
+         CodingResult.execution_time, CodingResult.created_at),
+        analytics.coding_deltas, archived_coding_delta
+    )
+    design = rebuild_rollups(
+        DesignResult, DesignResultArchive, DesignRollup, "question_id",
+        (DesignResult.question_id, DesignResult.score, DesignResult.created_at),
+        analytics.design_deltas, archived_design_delta
+    )
+    db.session.commit()
+    click.echo(f"Rebuilt {coding} coding and {design} design rollups.")
+
+def compact_results(max_age_days=None, batch_size=None):
+    # Moves result rows older than the retention age into the per-day archive
+    # tables. Each batch is a DELETE ... RETURNING folded into the archive in
+    # the same transaction, so concurrent compactors never double count.
+    max_age_days = max_age_days or app.config["RESULT_RETENTION_DAYS"]
+    batch_size = batch_size or app.config["RESULT_RETENTION_BATCH_SIZE"]
+    if not max_age_days:
+        return 0
+    cutoff = analytics.utcnow() - timedelta(days=max_age_days)
+    moved = 0
+    for model, archive_model, key_column in (
+        (CodingResult, CodingResultArchive, "problem_id"),
+        (DesignResult, DesignResultArchive, "question_id"),
+    ):
+        while True:
+            ids = db.select(model.id).where(model.created_at < cutoff).order_by(model.id).limit(batch_size)
+            rows = db.session.execute(
+                db.delete(model).where(model.id.in_(ids)).returning(*model.__table__.columns)
+            ).mappings().all()
+            if not rows:
+                db.session.commit()
+                break
+            archive = {}
+            for row in rows:
+                key = (analytics.bucket_start(row["created_at"], "day"), row[key_column])
+                entry = archive.setdefault(key, {
+                    "attempts": 0, "passed": 0, "total": 0, "time_sum": 0.0, "score_sum": 0, "solved": 0,
+                    "latency_hist": analytics.empty_histogram()
+                })
+                entry["attempts"] += 1
+                if model is CodingResult:
+                    passed, total, elapsed = row["passed"] or 0, row["total"] or 0, row["execution_time"] or 0.0
+                    entry["passed"] += passed
+                    entry["total"] += total
+                    entry["time_sum"] += elapsed
+                    entry["solved"] += 1 if total and passed == total else 0
+                    entry["latency_hist"][analytics.latency_bucket(elapsed)] += 1
+                else:
+                    entry["score_sum"] += row["score"] or 0
+            for (day, key), entry in archive.items():
+                archived = archive_model.query.filter_by(day=day, **{key_column: key}).first()
+                if archived is None:
+                    archived = archive_model(day=day, **{key_column: key})
+                    db.session.add(archived)
+                for field in ("attempts", "passed", "total", "time_sum", "score_sum", "solved"):
+                    if hasattr(archive_model, field):
+                        setattr(archived, field, (getattr(archived, field) or 0) + entry[field])
+                if archive_model is CodingResultArchive:
+                    hist = json.loads(archived.latency_hist) if archived.latency_hist else analytics.empty_histogram()
+                    archived.latency_hist = json.dumps(analytics.merge_histograms(hist, entry["latency_hist"]))
             db.session.commit()
-    first_request_done = True
+            moved += len(rows)
+    return moved
 
-setup_db_once()
+@db_cli.command("compact")
+@click.option("--days", type=int, default=None, help="Retention age in days (defaults to RESULT_RETENTION_DAYS).")
+def db_compact_command(days):
+    """Archive old result rows and reclaim free pages."""
+    days = days or app.config["RESULT_RETENTION_DAYS"]
+    if not days:
+        click.echo("No retention age configured; pass --days or set RESULT_RETENTION_DAYS.")
+        return
+    moved = compact_results(days)
+    incremental_vacuum(db.engine, 0)
+    click.echo(f"Archived {moved} result rows older than {days} days.")
+
+retention_worker = None
+if app.config["RESULT_RETENTION_DAYS"]:
+    retention_worker = RetentionWorker(
+        app, db, compact_results,
+        interval=app.config["RESULT_RETENTION_INTERVAL"],
+        vacuum_pages=app.config["RESULT_RETENTION_VACUUM_PAGES"]
+    )
+    retention_worker.start()
 
 # Utility: Load diagnostic_data.json
-def load_diagnostic_data():
+def read_diagnostic_data():
     if not os.path.exists(DATA_FILE):
         return {}
     try:
@@ -310,6 +734,48 @@ def load_diagnostic_data():
         print(f"Error loading diagnostic data: {e}")
         return {}
 
+class ProblemBank:
+    # Parsed diagnostic_data.json, loaded at import so prefork workers share it
+    # copy-on-write. The file's mtime is checked at most every
+    # ``check_interval`` seconds and the bank is re-read when it changes.
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self.data = {}
+        self.mtime = None
+        self.checked_at = 0.0
+        self.reloads = 0
+        self.lock = threading.Lock()
+        self.reload()
+
+    def _mtime(self):
+        try:
+            return os.stat(DATA_FILE).st_mtime_ns
+        except OSError:
+            return None
+
+    def reload(self):
+        with self.lock:
+            self.mtime = self._mtime()
+            self.data = read_diagnostic_data()
+            self.checked_at = time.monotonic()
+            self.reloads += 1
+
+    def get(self):
+        now = time.monotonic()
+        if now - self.checked_at >= self.check_interval:
+            self.checked_at = now
+            if self._mtime() != self.mtime:
+                self.reload()
+        return self.data
+
+problem_bank = ProblemBank(check_interval=app.config["PROBLEM_BANK_CHECK_INTERVAL"])
+registry.counter(
+    "problem_bank_loads_total", "Times diagnostic_data.json was (re)loaded.", callback=lambda: problem_bank.reloads
+)
+
+def load_diagnostic_data():
+    return problem_bank.get()
+
 def load_problem_bank():
     data = load_diagnostic_data()
     return data.get('coding_problems', [])
@@ -322,10 +788,38 @@ def load_design_questions():
 # 3. Routes
 ########################################################
 
+# data version -> rendered scenario list
+scenario_list_cache = LRUCache(max_entries=4)
+
 @app.route("/")
 def index():
-    scenarios = Scenario.query.all()
-    return render_template_string(TEMPLATES["index"], scenarios=scenarios)
+    version = scenario_data_version()
+    fragment = scenario_list_cache.get(version)
+    if fragment is None:
+        fragment = Markup(render_template("scenario_list.html", scenarios=Scenario.query.all()))
+        scenario_list_cache.put(version, fragment)
+    return render_template("index.html", scenario_list=fragment)
+
+@app.route("/scenario/<int:scenario_id>/step/<int:step_num>", methods=["GET", "POST"])
+def show_step(scenario_id, step_num):
+    scenario = db.get_or_404(Scenario, scenario_id)
+    step = Step.query.filter_by(scenario_id=scenario_id, step_number=step_num).first_or_404()
+    existing = Response.query.filter_by(scenario_id=scenario_id, step_id=step.id).first()
+    if request.method == "POST":
+        save_response(scenario_id, step.id, request.form.get("user_response", ""), existing)
+        if Step.query.filter_by(scenario_id=scenario_id, step_number=step_num + 1).first():
+            return redirect(url_for("show_step", scenario_id=scenario_id, step_num=step_num + 1))
+        return redirect(url_for("show_summary", scenario_id=scenario_id))
+    prefill = existing.user_response_text if existing else ""
+    return render_template("step.html", scenario=scenario, step=step, step_num=step_num, prefill=prefill)
+
+@app.route("/scenario/<int:scenario_id>/summary")
+def show_summary(scenario_id):
+    scenario = db.get_or_404(Scenario, scenario_id)
+    steps = Step.query.filter_by(scenario_id=scenario_id).order_by(Step.step_number.asc()).all()
+    responses = {r.step_id: r for r in Response.query.filter_by(scenario_id=scenario_id)}
+    user_responses = [(st, responses.get(st.id)) for st in steps]
+    return render_template("summary.html", scenario=scenario, user_responses=user_responses)
 
 ############################
 # CODING CHALLENGE ENDPOINTS
@@ -469,51 +963,70 @@ def get_coding_challenges_by_level():
     filtered_problems = [p for p in all_problems if p['id'] in problem_ids]
     return jsonify(filtered_problems)
 
-def execute_user_code(user_code, test_cases, timeout=5):
-    results = []
-    for test in test_cases:
-        input_data = test.get('input', '')
-        expected = test.get('expected')
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as temp_file:
-            temp_file.write(user_code)
-            temp_file.write("\n")
-            temp_file.write("import json\n")
-            temp_file.write("if __name__ == '__main__':\n")
-            temp_file.write("    data = json.loads('''{}''')\n".format(json.dumps(input_data)))
-            temp_file.write("    output = solution(data)\n")
-            temp_file.write("    print(json.dumps(output))\n")
-            temp_filename = temp_file.name
-        try:
-            start_time = time.time()
-            proc = subprocess.run(['python', temp_filename], capture_output=True, text=True, timeout=timeout)
-            exec_time = time.time() - start_time
-            stdout = proc.stdout.strip()
-            stderr = proc.stderr.strip()
-            try:
-                output = json.loads(stdout)
-            except Exception:
-                output = stdout
-            passed = (output == expected) and (proc.returncode == 0)
-            results.append({
-                'input': input_data,
-                'expected': expected,
-                'output': output,
-                'passed': passed,
-                'execution_time': exec_time,
-                'error': stderr
-            })
-        except subprocess.TimeoutExpired:
-            results.append({
-                'input': input_data,
-                'expected': expected,
-                'output': None,
-                'passed': False,
-                'execution_time': timeout,
-                'error': 'Timeout'
-            })
-        finally:
-            os.remove(temp_filename)
-    return results
+submission_admission = AdmissionController(
+    max_in_flight=app.config["SUBMIT_MAX_IN_FLIGHT"],
+    max_waiting=app.config["SUBMIT_MAX_WAITING"],
+    wait_timeout=app.config["SUBMIT_WAIT_TIMEOUT"],
+    rate=app.config["SUBMIT_RATE"],
+    burst=app.config["SUBMIT_BURST"]
+)
+
+def client_key(remote_addr, header_value=None):
+    # The first hop of SUBMIT_CLIENT_HEADER (e.g. X-Forwarded-For) when configured.
+    if app.config["SUBMIT_CLIENT_HEADER"] and header_value:
+        return header_value.split(",")[0].strip()
+    return remote_addr or "unknown"
+
+def request_client_key():
+    header = app.config["SUBMIT_CLIENT_HEADER"]
+    return client_key(request.remote_addr, request.headers.get(header) if header else None)
+
+@app.errorhandler(Rejected)
+def submission_rejected(e):
+    response = jsonify({"description": "Too many submissions, retry later", "reason": e.reason})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+sandbox_pool = None
+if app.config["SANDBOX_WORKERS"]:
+    sandbox_pool = SandboxPool(
+        app.config["SANDBOX_WORKERS"],
+        lease_timeout=app.config["SANDBOX_LEASE_TIMEOUT"],
+        max_attempts=app.config["SANDBOX_MAX_ATTEMPTS"],
+        token=app.config["SANDBOX_WORKER_TOKEN"]
+    )
+
+def run_submission(user_code, test_cases):
+    if sandbox_pool is not None:
+        return sandbox_pool.run(user_code, test_cases)
+    return execute_user_code(user_code, test_cases)
+
+def iter_submission(user_code, test_cases):
+    if sandbox_pool is not None:
+        return sandbox_pool.iter(user_code, test_cases)
+    return iter_user_code(user_code, test_cases)
+
+@app.errorhandler(SandboxUnavailable)
+def sandbox_unavailable(e):
+    print(f"Sandbox unavailable: {e}")
+    response = jsonify({"description": "No sandbox capacity available, retry later"})
+    response.status_code = 503
+    response.headers["Retry-After"] = "5"
+    return response
+
+def find_problem(problem_id):
+    return next((p for p in load_problem_bank() if p.get('id') == problem_id), None)
+
+def record_submission(problem_id, results):
+    passed_cases = sum(1 for r in results if r['passed'])
+    store_results(CodingResult, [{
+        'problem_id': problem_id,
+        'passed': passed_cases,
+        'total': len(results),
+        'execution_time': sum(r['execution_time'] for r in results)
+    }])
+    return passed_cases
 
 @app.route('/api/submit_code', methods=['POST'])
 def submit_code():
@@ -567,6 +1080,10 @@ def submit_code():
           description: Invalid JSON or missing problem_id or code.
         '404':
           description: Problem not found.
+        '429':
+          description: Too many submissions; retry after the number of seconds in the Retry-After header.
+        '503':
+          description: No sandbox worker could run the submission.
     """
     data = request.get_json()
     if not data:
@@ -575,29 +1092,96 @@ def submit_code():
     user_code = data.get('code')
     if not problem_id or not user_code:
         abort(400, description="Missing problem_id or code")
-    problems = load_problem_bank()
-    problem = next((p for p in problems if p.get('id') == problem_id), None)
+    problem = find_problem(problem_id)
     if not problem:
         abort(404, description="Problem not found")
     test_cases = problem.get('test_cases', [])
-    results = execute_user_code(user_code, test_cases)
-    passed_cases = sum(1 for r in results if r['passed'])
-    total_cases = len(test_cases)
-    new_result = CodingResult(
-        problem_id=problem_id,
-        passed=passed_cases,
-        total=total_cases,
-        execution_time=sum(r['execution_time'] for r in results)
-    )
-    db.session.add(new_result)
-    db.session.commit()
+    with submission_admission.admit(request_client_key()):
+        results = run_submission(user_code, test_cases)
+    passed_cases = record_submission(problem_id, results)
     return jsonify({
         'problem_id': problem_id,
         'results': results,
         'passed_cases': passed_cases,
-        'total_cases': total_cases
+        'total_cases': len(test_cases)
     })
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+@app.route('/api/submit_code/stream', methods=['POST'])
+def submit_code_stream():
+    """
+    ---
+    post:
+      description: Submit a coding solution and stream each test case result as a Server-Sent Event
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                problem_id:
+                  type: string
+                code:
+                  type: string
+      responses:
+        '200':
+          description: >
+            An event stream with one "case" event per completed test case (the
+            submit_code result fields plus its index) followed by a "summary"
+            event with problem_id, passed_cases and total_cases, or by an
+            "error" event if no sandbox worker could finish the submission.
+          content:
+            text/event-stream:
+              schema:
+                type: string
+        '400':
+          description: Invalid JSON or missing problem_id or code.
+        '404':
+          description: Problem not found.
+        '429':
+          description: Too many submissions; retry after the number of seconds in the Retry-After header.
+    """
+    data = request.get_json()
+    if not data:
+        abort(400, description="Invalid JSON")
+    problem_id = data.get('problem_id')
+    user_code = data.get('code')
+    if not problem_id or not user_code:
+        abort(400, description="Missing problem_id or code")
+    problem = find_problem(problem_id)
+    if not problem:
+        abort(404, description="Problem not found")
+    test_cases = problem.get('test_cases', [])
+    ticket = submission_admission.admit(request_client_key())
+
+    def generate():
+        results = []
+        with ticket:
+            try:
+                for index, result in enumerate(iter_submission(user_code, test_cases)):
+                    results.append(result)
+                    yield sse_event("case", dict(result, index=index))
+            except SandboxUnavailable as e:
+                print(f"Sandbox unavailable: {e}")
+                yield sse_event("error", {"description": "No sandbox capacity available, retry later"})
+                return
+        passed_cases = record_submission(problem_id, results)
+        yield sse_event("summary", {
+            'problem_id': problem_id,
+            'passed_cases': passed_cases,
+            'total_cases': len(test_cases)
+        })
+
+    response = HTTPResponse(stream_with_context(generate()), mimetype="text/event-stream", headers=SSE_HEADERS)
+    # Frees the slot if the client disconnects before the stream starts.
+    response.call_on_close(ticket.release)
+    return response
+
 ############################
 # DESIGN QUESTIONS ENDPOINTS
 ############################
@@ -700,6 +1284,7 @@ def submit_design():
         abort(400, description="No responses provided")
     total_score = 0
     max_score = 0
+    design_rows = []
     for response in responses:
         question_id = response.get('question_id')
         selected = response.get('selected_option')
@@ -709,14 +1294,140 @@ def submit_design():
             score = 1 if selected == question.get('correct_option') else 0
             total_score += score
             max_score += 1
-            new_design = DesignResult(question_id=question_id, score=score)
-            db.session.add(new_design)
-    db.session.commit()
+            design_rows.append({'question_id': question_id, 'score': score})
+    store_results(DesignResult, design_rows)
     return jsonify({
         'total_score': total_score,
         'max_score': max_score
     })
 
+############################
+# SEARCH ENDPOINT
+############################
+
+class ProblemSearch:
+    # BM25 index over coding problems and design questions, kept in step with
+    # the problem bank: after a reload only changed documents are re-indexed.
+    def __init__(self):
+        self.index = SearchIndex()
+        self.docs = {}
+        self.bank_version = None
+
+    def refresh(self):
+        problem_bank.get()
+        with problem_bank.lock:
+            data, version = problem_bank.data, problem_bank.reloads
+        if version == self.bank_version:
+            return
+        fields, docs = {}, {}
+        for p in data.get('coding_problems', []):
+            key = ('coding', p.get('id'))
+            fields[key] = {name: p.get(name) for name in ('title', 'problem_statement', 'topics', 'company_context')}
+            docs[key] = {'type': 'coding', 'id': p.get('id'), 'title': p.get('title'),
+                         'difficulty': p.get('difficulty'), 'topics': p.get('topics', [])}
+        for q in data.get('system_design_questions', []):
+            key = ('design', q.get('id'))
+            fields[key] = {name: q.get(name) for name in ('title', 'context')}
+            docs[key] = {'type': 'design', 'id': q.get('id'), 'title': q.get('title'),
+                         'difficulty': q.get('difficulty')}
+        self.index.update(fields)
+        self.docs, self.bank_version = docs, version
+
+    def search(self, query, kind=None):
+        self.refresh()
+        doc_filter = (lambda key: key[0] == kind) if kind else None
+        return [dict(self.docs[key], score=round(score, 4)) for score, key in self.index.search(query, doc_filter)]
+
+problem_search = ProblemSearch()
+problem_search.refresh()
+
+MAX_SEARCH_PAGE_SIZE = 50
+
+@app.route('/api/search', methods=['GET'])
+def search_problems():
+    """
+    ---
+    get:
+      description: Ranked full-text search over coding problems and system design questions
+      parameters:
+        - in: query
+          name: q
+          required: true
+          schema:
+            type: string
+        - in: query
+          name: type
+          required: false
+          schema:
+            type: string
+            enum: [coding, design]
+        - in: query
+          name: page
+          required: false
+          schema:
+            type: integer
+            default: 1
+        - in: query
+          name: per_page
+          required: false
+          schema:
+            type: integer
+            default: 10
+            maximum: 50
+      responses:
+        '200':
+          description: One page of results, best match first
+          content:
+            application/json:
+              schema:
+                type: object
+                properties:
+                  query:
+                    type: string
+                  total:
+                    type: integer
+                  page:
+                    type: integer
+                  per_page:
+                    type: integer
+                  results:
+                    type: array
+                    items:
+                      type: object
+                      properties:
+                        type:
+                          type: string
+                        id:
+                          type: string
+                        title:
+                          type: string
+                        difficulty:
+                          type: string
+                        score:
+                          type: number
+        '400':
+          description: Missing query or invalid type or paging parameters.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        abort(400, description="Missing q")
+    kind = request.args.get('type')
+    if kind not in (None, 'coding', 'design'):
+        abort(400, description="type must be coding or design")
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+    if page < 1 or not 1 <= per_page <= MAX_SEARCH_PAGE_SIZE:
+        abort(400, description=f"page must be >= 1 and per_page between 1 and {MAX_SEARCH_PAGE_SIZE}")
+    results = problem_search.search(query, kind)
+    start = (page - 1) * per_page
+    return jsonify({
+        'query': query,
+        'total': len(results),
+        'page': page,
+        'per_page': per_page,
+        'results': results[start:start + per_page]
+    })
+
 ############################
 # DIAGNOSTIC REPORT ENDPOINT
 ############################
@@ -753,6 +1464,23 @@ def diagnostic_report():
                         type: integer
                       percentage:
                         type: number
+                  responses:
+                    type: object
+                    description: Rubric scores of free-text wizard responses, averaged per competency.
+                    properties:
+                      scored:
+                        type: integer
+                      total:
+                        type: integer
+                      competencies:
+                        type: object
+                        additionalProperties:
+                          type: object
+                          properties:
+                            average_score:
+                              type: number
+                            average_level:
+                              type: number
                   overall_recommendation:
                     type: string
     """
@@ -766,6 +1494,15 @@ def diagnostic_report():
     design_res = db.session.query(db.func.sum(DesignResult.score), db.func.count(DesignResult.id)).first()
     if design_res and design_res[0] is not None:
         design_total, design_possible = design_res
+    # Rows moved out by retention still count towards the lifetime totals.
+    archived_coding = db.session.query(db.func.sum(CodingResultArchive.passed), db.func.sum(CodingResultArchive.total)).first()
+    if archived_coding and archived_coding[0] is not None:
+        coding_total += archived_coding[0]
+        coding_possible += archived_coding[1]
+    archived_design = db.session.query(db.func.sum(DesignResultArchive.score_sum), db.func.sum(DesignResultArchive.attempts)).first()
+    if archived_design and archived_design[0] is not None:
+        design_total += archived_design[0]
+        design_possible += archived_design[1]
     report = {
         'coding': {
             'passed': coding_total or 0,
@@ -777,6 +1514,7 @@ def diagnostic_report():
             'total': design_possible or 0,
             'percentage': (design_total / design_possible * 100) if design_possible else 0
         },
+        'responses': response_score_summary(),
         'overall_recommendation': generate_recommendation(coding_total, coding_possible, design_total, design_possible)
     }
     return jsonify(report)
@@ -805,10 +1543,278 @@ def generate_recommendation(coding_passed, coding_total, design_score, design_to
             recommendations.append("Strong system design knowledge; keep refining with complex architectures.")
     return " ".join(recommendations)
 
+############################
+# ANALYTICS ENDPOINT
+############################
+
+def parse_timestamp(value, name):
+    try:
+        parsed = datetime.fromisoformat(value) if value else None
+    except ValueError:
+        abort(400, description=f"Invalid {name} timestamp")
+    # Buckets are stored as naive UTC, so aware timestamps are converted first.
+    if parsed is not None and parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+@app.route('/api/analytics/results', methods=['GET'])
+def results_analytics():
+    """
+    ---
+    get:
+      description: Time-bucketed pass rates, latency percentiles and attempt counts from pre-aggregated rollups
+      parameters:
+        - in: query
+          name: granularity
+          required: false
+          schema:
+            type: string
+            enum: [hour, day, week]
+        - in: query
+          name: since
+          required: false
+          schema:
+            type: string
+            format: date-time
+        - in: query
+          name: until
+          required: false
+          schema:
+            type: string
+            format: date-time
+        - in: query
+          name: problem_id
+          required: false
+          schema:
+            type: string
+        - in: query
+          name: question_id
+          required: false
+          schema:
+            type: string
+      responses:
+        '200':
+          description: Analytics buckets
+          content:
+            application/json:
+              schema:
+                type: object
+                properties:
+                  granularity:
+                    type: string
+                  coding:
+                    type: array
+                    items:
+                      type: object
+                      properties:
+                        bucket_start:
+                          type: string
+                        problem_id:
+                          type: string
+                        attempts:
+                          type: integer
+                        solved:
+                          type: integer
+                        pass_rate:
+                          type: number
+                        latency:
+                          type: object
+                          properties:
+                            p50:
+                              type: number
+                            p95:
+                              type: number
+                            p99:
+                              type: number
+                  design:
+                    type: array
+                    items:
+                      type: object
+                      properties:
+                        bucket_start:
+                          type: string
+                        question_id:
+                          type: string
+                        attempts:
+                          type: integer
+                        pass_rate:
+                          type: number
+        '400':
+          description: Invalid granularity or timestamp.
+    """
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in analytics.GRANULARITIES:
+        abort(400, description="Invalid granularity")
+    until = parse_timestamp(request.args.get('until'), 'until')
+    since = parse_timestamp(request.args.get('since'), 'since') or (until or analytics.utcnow()) - analytics.DEFAULT_WINDOWS[granularity]
+    problem_id = request.args.get('problem_id')
+    question_id = request.args.get('question_id')
+
+    coding_query = CodingRollup.query.filter(
+        CodingRollup.granularity == granularity,
+        CodingRollup.bucket_start >= analytics.bucket_start(since, granularity)
+    )
+    design_query = DesignRollup.query.filter(
+        DesignRollup.granularity == granularity,
+        DesignRollup.bucket_start >= analytics.bucket_start(since, granularity)
+    )
+    if until:
+        coding_query = coding_query.filter(CodingRollup.bucket_start < until)
+        design_query = design_query.filter(DesignRollup.bucket_start < until)
+    if problem_id:
+        coding_query = coding_query.filter(CodingRollup.problem_id == problem_id)
+    if question_id:
+        design_query = design_query.filter(DesignRollup.question_id == question_id)
+
+    coding = []
+    for r in coding_query.order_by(CodingRollup.bucket_start, CodingRollup.problem_id):
+        hist = json.loads(r.latency_hist) if r.latency_hist else analytics.empty_histogram()
+        coding.append({
+            "bucket_start": r.bucket_start.isoformat(),
+            "problem_id": r.problem_id,
+            "attempts": r.attempts,
+            "solved": r.solved,
+            "pass_rate": (r.passed_cases / r.total_cases) if r.total_cases else 0,
+            "latency": {
+                "mean": (r.time_sum / r.attempts) if r.attempts else None,
+                "p50": analytics.histogram_percentile(hist, 0.50),
+                "p95": analytics.histogram_percentile(hist, 0.95),
+                "p99": analytics.histogram_percentile(hist, 0.99)
+            }
+        })
+    design = [
+        {
+            "bucket_start": r.bucket_start.isoformat(),
+            "question_id": r.question_id,
+            "attempts": r.attempts,
+            "pass_rate": (r.score_sum / r.attempts) if r.attempts else 0
+        }
+        for r in design_query.order_by(DesignRollup.bucket_start, DesignRollup.question_id)
+    ]
+    return jsonify({"granularity": granularity, "coding": coding, "design": design})
+
 ############################
 # WIZARD-SCENARIO ENDPOINTS
 ############################
 
+class ResponseRubric:
+    # Rubric built from system_design_assessment.core_competencies, rebuilt when the bank reloads.
+    def __init__(self):
+        self.rubric = None
+        self.bank_version = None
+
+    def get(self):
+        problem_bank.get()
+        with problem_bank.lock:
+            data, version = problem_bank.data, problem_bank.reloads
+        if version != self.bank_version:
+            competencies = data.get('system_design_assessment', {}).get('core_competencies') or {}
+            self.rubric = Rubric(competencies) if competencies else None
+            self.bank_version = version
+        return self.rubric
+
+response_rubric = ResponseRubric()
+
+def score_rows(rubric, responses):
+    # [(response_id, revision, text)] -> ResponseScore row dicts
+    rows = []
+    for response_id, revision, text in responses:
+        for competency, result in rubric.score(text).items():
+            rows.append({
+                'response_id': response_id,
+                'competency': competency,
+                'revision': revision,
+                'rubric_version': rubric.version,
+                'level': result['level'],
+                'score': result['score'],
+                'coverage': result['coverage'],
+                'skills': json.dumps(result['skills'])
+            })
+    return rows
+
+def replace_scores(rubric, responses):
+    ids = [r[0] for r in responses]
+    db.session.execute(db.delete(ResponseScore).where(ResponseScore.response_id.in_(ids)))
+    rows = score_rows(rubric, responses)
+    if rows:
+        db.session.execute(ResponseScore.__table__.insert(), rows)
+
+def save_response(scenario_id, step_id, text, existing=None):
+    # Upserts the response and scores it in the same transaction.
+    response = existing or Response.query.filter_by(scenario_id=scenario_id, step_id=step_id).first()
+    if response:
+        response.user_response_text = text
+        response.revision = (response.revision or 0) + 1
+    else:
+        response = Response(scenario_id=scenario_id, step_id=step_id, user_response_text=text, revision=0)
+        db.session.add(response)
+    db.session.flush()
+    rubric = response_rubric.get()
+    if rubric is not None:
+        replace_scores(rubric, [(response.id, response.revision, text)])
+    db.session.commit()
+    return response
+
+def score_pending_responses(batch_size=5000, full=False):
+    """Score responses that are new, edited since scoring, or scored with an older rubric.
+
+    Returns the number of responses scored.
+    """
+    rubric = response_rubric.get()
+    if rubric is None:
+        return 0
+    if full:
+        ResponseScore.query.delete()
+        db.session.commit()
+    revision = db.func.coalesce(Response.revision, 0)
+    current = db.select(ResponseScore.response_id).where(
+        ResponseScore.response_id == Response.id,
+        ResponseScore.revision == revision,
+        ResponseScore.rubric_version == rubric.version
+    )
+    scored = 0
+    last_id = 0
+    while True:
+        batch = db.session.execute(
+            db.select(Response.id, revision, Response.user_response_text)
+            .where(Response.id > last_id, ~current.exists())
+            .order_by(Response.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            return scored
+        replace_scores(rubric, [tuple(row) for row in batch])
+        db.session.commit()
+        scored += len(batch)
+        last_id = batch[-1][0]
+
+@db_cli.command("score-responses")
+@click.option("--full", is_flag=True, help="Rescore every response, not just new or changed ones.")
+@click.option("--batch-size", type=int, default=5000, show_default=True)
+def db_score_responses_command(full, batch_size):
+    """Score wizard responses against the design rubric."""
+    start = time.perf_counter()
+    scored = score_pending_responses(batch_size=batch_size, full=full)
+    click.echo(f"Scored {scored} responses in {time.perf_counter() - start:.1f}s.")
+
+def response_score_summary():
+    rubric = response_rubric.get()
+    total = db.session.query(db.func.count(Response.id)).scalar() or 0
+    if rubric is None:
+        return {'scored': 0, 'total': total, 'competencies': {}}
+    rows = db.session.query(
+        ResponseScore.competency, db.func.avg(ResponseScore.score), db.func.avg(ResponseScore.level),
+        db.func.count(ResponseScore.response_id)
+    ).filter(ResponseScore.rubric_version == rubric.version).group_by(ResponseScore.competency).all()
+    return {
+        'scored': max((count for _, _, _, count in rows), default=0),
+        'total': total,
+        'competencies': {
+            competency: {'average_score': round(score, 2), 'average_level': round(level, 2)}
+            for competency, score, level, _ in rows
+        }
+    }
+
 @app.route('/api/wizard/scenarios', methods=['GET'])
 def list_wizard_scenarios():
     """
@@ -929,13 +1935,7 @@ def submit_wizard_response():
     if not scenario_id or not step_id:
         abort(400, "Missing scenario_id or step_id")
     try:
-        existing_response = Response.query.filter_by(scenario_id=scenario_id, step_id=step_id).first()
-        if existing_response:
-            existing_response.user_response_text = user_answer
-        else:
-            new_resp = Response(scenario_id=scenario_id, step_id=step_id, user_response_text=user_answer)
-            db.session.add(new_resp)
-        db.session.commit()
+        save_response(scenario_id, step_id, user_answer)
         return jsonify({"message": "Response saved"})
     except Exception as e:
         print(e)
@@ -996,12 +1996,57 @@ def wizard_summary(scenario_id):
 # DIAGRAM STATE ENDPOINTS
 ############################
 
+diagram_store = DiagramStore(
+    db, DiagramVersion,
+    snapshot_every=app.config["DIAGRAM_SNAPSHOT_EVERY"],
+    keep_snapshots=app.config["DIAGRAM_KEEP_SNAPSHOTS"]
+)
+
+# scenario_id -> (version, diagram, serialized GET body, time last validated)
+diagram_cache = LRUCache(
+    max_entries=app.config["DIAGRAM_CACHE_ENTRIES"],
+    max_bytes=app.config["DIAGRAM_CACHE_BYTES"],
+    sizeof=lambda entry: len(entry[2])
+)
+
+registry.counter("diagram_cache_hits_total", "Diagram cache hits.", callback=lambda: diagram_cache.hits)
+registry.counter("diagram_cache_misses_total", "Diagram cache misses.", callback=lambda: diagram_cache.misses)
+
+def cache_diagram(scenario_id, version, diagram_state):
+    body = app.json.dumps({"diagram": diagram_state, "version": version}).encode()
+    entry = (version, diagram_state, body, time.monotonic())
+    diagram_cache.put(scenario_id, entry)
+    return entry
+
+def load_diagram(scenario_id):
+    entry = diagram_cache.get(scenario_id)
+    if entry is not None:
+        if time.monotonic() - entry[3] < app.config["DIAGRAM_CACHE_TTL"]:
+            return entry
+        if diagram_store.head_version(scenario_id) == entry[0]:
+            entry = entry[:3] + (time.monotonic(),)
+            diagram_cache.put(scenario_id, entry)
+            return entry
+    version, diagram_state = diagram_store.load(scenario_id)
+    if diagram_state is None:
+        # Diagrams saved before the versioned store were written to the CWD.
+        legacy_file = f"diagram_{scenario_id}.json"
+        if not os.path.exists(legacy_file):
+            return 0, None, None, None
+        with open(legacy_file, "r") as f:
+            diagram_state = json.load(f)
+        version = diagram_store.save(scenario_id, diagram_state)
+    return cache_diagram(scenario_id, version, diagram_state)
+
+def diagram_etag(scenario_id, version):
+    return f"{scenario_id}-{version}"
+
 @app.route('/api/wizard/scenario/<int:scenario_id>/diagram', methods=['POST'])
 def save_diagram_state(scenario_id):
     """
     ---
     post:
-      description: Save the diagram state for a given scenario
+      description: Save the full diagram state for a given scenario as a new version
       parameters:
         - in: path
           name: scenario_id
@@ -1027,6 +2072,8 @@ def save_diagram_state(scenario_id):
                 properties:
                   message:
                     type: string
+                  version:
+                    type: integer
         '400':
           description: Missing diagram state.
     """
@@ -1034,10 +2081,96 @@ def save_diagram_state(scenario_id):
     diagram_state = data.get('diagram')
     if not diagram_state:
         abort(400, description="Missing diagram state")
-    filename = f"diagram_{scenario_id}.json"
-    with open(filename, "w") as f:
-        json.dump(diagram_state, f)
-    return jsonify({"message": "Diagram state saved"}), 200
+    try:
+        version = diagram_store.save(scenario_id, diagram_state)
+    except VersionConflict:
+        diagram_cache.invalidate(scenario_id)
+        abort(409, description="Concurrent diagram save; retry")
+    cache_diagram(scenario_id, version, diagram_state)
+    return jsonify({"message": "Diagram state saved", "version": version}), 200
+
+@app.route('/api/wizard/scenario/<int:scenario_id>/diagram', methods=['PATCH'])
+def patch_diagram_state(scenario_id):
+    """
+    ---
+    patch:
+      description: Apply a JSON Patch (RFC 6902) to the diagram state at a given version
+      parameters:
+        - in: path
+          name: scenario_id
+          required: true
+          schema:
+            type: integer
+      requestBody:
+        required: true
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                base_version:
+                  type: integer
+                patch:
+                  type: array
+                  items:
+                    type: object
+                    properties:
+                      op:
+                        type: string
+                      path:
+                        type: string
+                      from:
+                        type: string
+                      value: {}
+      responses:
+        '200':
+          description: Patch applied
+          content:
+            application/json:
+              schema:
+                type: object
+                properties:
+                  message:
+                    type: string
+                  version:
+                    type: integer
+        '400':
+          description: Missing base_version or patch, or the patch does not apply.
+        '409':
+          description: base_version is not the current version.
+          content:
+            application/json:
+              schema:
+                type: object
+                properties:
+                  message:
+                    type: string
+                  version:
+                    type: integer
+    """
+    data = request.get_json()
+    if not data:
+        abort(400, description="Invalid JSON")
+    base_version = data.get('base_version')
+    operations = data.get('patch')
+    if not isinstance(base_version, int) or operations is None:
+        abort(400, description="Missing base_version or patch")
+    current_version, current_state, _, _ = load_diagram(scenario_id)
+    if current_version != base_version:
+        # The cached copy may predate a save made by another worker.
+        diagram_cache.invalidate(scenario_id)
+        current_version, current_state, _, _ = load_diagram(scenario_id)
+    try:
+        version, diagram_state = diagram_store.patch(
+            scenario_id, base_version, operations, current=(current_version, current_state)
+        )
+    except VersionConflict as e:
+        diagram_cache.invalidate(scenario_id)
+        return jsonify({"message": "Diagram version conflict", "version": e.current_version}), 409
+    except PatchError as e:
+        abort(400, description=str(e))
+    cache_diagram(scenario_id, version, diagram_state)
+    return jsonify({"message": "Diagram patch applied", "version": version}), 200
 
 @app.route('/api/wizard/scenario/<int:scenario_id>/diagram', methods=['GET'])
 def load_diagram_state(scenario_id):
@@ -1051,9 +2184,18 @@ def load_diagram_state(scenario_id):
           required: true
           schema:
             type: integer
+        - in: header
+          name: If-None-Match
+          required: false
+          schema:
+            type: string
       responses:
         '200':
           description: Diagram state retrieved successfully
+          headers:
+            ETag:
+              schema:
+                type: string
           content:
             application/json:
               schema:
@@ -1061,20 +2203,76 @@ def load_diagram_state(scenario_id):
                 properties:
                   diagram:
                     type: object
+                  version:
+                    type: integer
+        '304':
+          description: Diagram unchanged since the version in If-None-Match.
         '404':
           description: No diagram state found.
     """
-    filename = f"diagram_{scenario_id}.json"
-    if not os.path.exists(filename):
+    version, diagram_state, body, _ = load_diagram(scenario_id)
+    if diagram_state is None:
         abort(404, description="No diagram state found")
-    with open(filename, "r") as f:
-        diagram_state = json.load(f)
-    return jsonify({"diagram": diagram_state}), 200
+    etag = diagram_etag(scenario_id, version)
+    if etag in request.if_none_match:
+        response = HTTPResponse(status=304)
+    else:
+        response = HTTPResponse(body, status=200, mimetype="application/json")
+    response.set_etag(etag)
+    return response
 
 ############################
 # MODEL ANSWERS ENDPOINT
 ############################
 
+class ModelAnswerIndex:
+    # Model answers live in the seed file keyed by (scenario id, step number);
+    # step ids are resolved with one query and re-resolved when the seeded
+    # data version changes.
+    def __init__(self, path=SEED_FILE):
+        self.answers = {}
+        self.data_version = None
+        self.step_keys = {}
+        self.scenario_steps = {}
+        try:
+            seed = load_seed_data(path)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error loading model answers: {e}")
+            return
+        for sc in seed.get('scenarios', []):
+            for st in sc.get('steps', []):
+                if st.get('model_answer'):
+                    self.answers[(sc['id'], st['step_number'])] = st['model_answer']
+
+    def refresh(self):
+        version = scenario_data_version()
+        if version == self.data_version:
+            return
+        step_keys = {}
+        scenario_steps = {}
+        rows = db.session.query(Step.id, Step.scenario_id, Step.step_number).order_by(Step.step_number)
+        for step_id, scenario_id, step_number in rows:
+            step_keys[step_id] = (scenario_id, step_number)
+            scenario_steps.setdefault(scenario_id, []).append((step_id, step_number))
+        self.step_keys, self.scenario_steps, self.data_version = step_keys, scenario_steps, version
+
+    def for_step(self, step_id):
+        self.refresh()
+        return self.answers.get(self.step_keys.get(step_id))
+
+    def for_scenario(self, scenario_id):
+        self.refresh()
+        return [
+            (step_id, step_number, self.answers.get((scenario_id, step_number)))
+            for step_id, step_number in self.scenario_steps.get(scenario_id, [])
+        ]
+
+model_answer_index = ModelAnswerIndex()
+with app.app_context():
+    model_answer_index.refresh()
+
+NO_MODEL_ANSWER = "No model answer available for this step."
+
 @app.route('/api/wizard/model_answers/<int:step_id>', methods=['GET'])
 def get_model_answers(step_id):
     """
@@ -1098,18 +2296,132 @@ def get_model_answers(step_id):
                   model_answer:
                     type: string
     """
-    model_answers = {
-        1: "A comprehensive answer should include both functional and non-functional requirements, such as features, performance targets, scalability constraints, and security measures.",
-        2: "Your architecture should define whether you use a monolithic or microservices approach, and list key components like API servers, databases, caching layers, and load balancers.",
-        3: "Data modeling should justify your choice of storage (SQL vs. NoSQL), detail schema design, and discuss indexing strategies and trade-offs.",
-        4: "Discuss how to scale the system, including load balancing, caching, and replication strategies to handle increased traffic.",
-        5: "Explain your strategies for fault tolerance, redundancy, and disaster recovery to ensure system availability.",
-        6: "Outline security measures like authentication, encryption, rate limiting, and abuse prevention.",
-        7: "Summarize your design, including key trade-offs and potential improvements for future scalability and performance."
-    }
-    answer = model_answers.get(step_id, "No model answer available for this step.")
+    answer = model_answer_index.for_step(step_id) or NO_MODEL_ANSWER
     return jsonify({"model_answer": answer})
 
+@app.route('/api/wizard/scenario/<int:scenario_id>/model_answers', methods=['GET'])
+def get_scenario_model_answers(scenario_id):
+    """
+    ---
+    get:
+      description: Get the model answers for every step of a wizard scenario
+      parameters:
+        - in: path
+          name: scenario_id
+          required: true
+          schema:
+            type: integer
+      responses:
+        '200':
+          description: Model answers for the scenario, ordered by step number
+          content:
+            application/json:
+              schema:
+                type: array
+                items:
+                  type: object
+                  properties:
+                    step_id:
+                      type: integer
+                    step_number:
+                      type: integer
+                    model_answer:
+                      type: string
+        '404':
+          description: Scenario not found.
+    """
+    answers = model_answer_index.for_scenario(scenario_id)
+    if not answers:
+        abort(404, description="Scenario not found")
+    return jsonify([
+        {"step_id": step_id, "step_number": step_number, "model_answer": answer or NO_MODEL_ANSWER}
+        for step_id, step_number, answer in answers
+    ])
+
+########################################################
+# Operations
+########################################################
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    ---
+    get:
+      description: Metrics in the Prometheus text exposition format, summed across workers when METRICS_DIR is set
+      responses:
+        '200':
+          description: Request, database, sandbox, queue and problem-bank metrics
+          content:
+            text/plain:
+              schema:
+                type: string
+    """
+    body = metrics_collector.render() if metrics_collector is not None else registry.render()
+    return HTTPResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """
+    ---
+    get:
+      description: List recent request profiles, newest first. Requires the X-Profile-Token header.
+      responses:
+        '200':
+          description: Profile summaries (request, status, duration and SQL totals)
+          content:
+            application/json:
+              schema:
+                type: array
+                items:
+                  type: object
+        '403':
+          description: Missing or invalid token, or profiling is not configured.
+    """
+    if not has_admin_token():
+        abort(403, description="Invalid profile token")
+    return jsonify(profile_store.list())
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    ---
+    get:
+      description: Fetch one request profile. Requires the X-Profile-Token header.
+      parameters:
+        - in: path
+          name: profile_id
+          required: true
+          schema:
+            type: string
+        - in: query
+          name: format
+          schema:
+            type: string
+            enum: [json, pstats]
+          description: pstats returns the raw cProfile dump.
+      responses:
+        '200':
+          description: The profile with SQL timings and the top functions by cumulative time
+        '403':
+          description: Missing or invalid token, or profiling is not configured.
+        '404':
+          description: Profile not found.
+    """
+    if not has_admin_token():
+        abort(403, description="Invalid profile token")
+    if request.args.get('format') == 'pstats':
+        path = profile_store.stats_path(profile_id)
+        if path is None:
+            abort(404, description="Profile not found")
+        with open(path, 'rb') as f:
+            return HTTPResponse(f.read(), mimetype="application/octet-stream", headers={
+                "Content-Disposition": f"attachment; filename={profile_id}.prof"
+            })
+    record = profile_store.load(profile_id)
+    if record is None:
+        abort(404, description="Profile not found")
+    return jsonify(record)
+
 ########################################################
 # SWAGGER CONFIGURATION
 ########################################################
@@ -1130,5 +2442,68 @@ swagger_config = {
 }
 swagger = Swagger(app, config=swagger_config)
 
+# /apispec.json is generated once (rather than re-parsing every docstring per
+# request) and served as pre-encoded bytes with an ETag.
+def build_apispec():
+    with app.app_context():
+        return swagger.get_apispecs("apispec")
+
+def check_apispec(spec):
+    try:
+        contract = load_contract(OPENAPI_FILE)
+    except (OSError, ValueError) as e:
+        print(f"Error loading {OPENAPI_FILE}: {e}")
+        return [], []
+    return check_contract(spec, contract)
+
+def encode_apispec():
+    path = app.config["APISPEC_FILE"]
+    if path and os.path.exists(path):
+        return EncodedSpec.from_file(path)
+    spec = build_apispec()
+    problems, _ = check_apispec(spec)
+    for problem in problems:
+        print(f"OpenAPI contract: {problem}")
+    return EncodedSpec(spec)
+
+encoded_apispec = encode_apispec()
+
+def serve_apispec():
+    gzipped = "gzip" in request.accept_encodings
+    etag = encoded_apispec.gzip_etag if gzipped else encoded_apispec.etag
+    if etag in request.if_none_match:
+        response = HTTPResponse(status=304)
+    elif gzipped:
+        response = HTTPResponse(encoded_apispec.gzipped, mimetype="application/json")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = HTTPResponse(encoded_apispec.body, mimetype="application/json")
+    response.headers["Vary"] = "Accept-Encoding"
+    response.set_etag(etag)
+    return response
+
+app.view_functions["flasgger.apispec"] = serve_apispec
+
+spec_cli = AppGroup("spec", help="Build and check the OpenAPI spec.")
+app.cli.add_command(spec_cli)
+
+@spec_cli.command("build")
+@click.option("--output", default="apispec.json", show_default=True, help="Where to write the spec (see APISPEC_FILE).")
+def spec_build_command(output):
+    with open(output, "w") as f:
+        json.dump(build_apispec(), f, indent=2, sort_keys=True)
+    click.echo(f"Wrote {output}.")
+
+@spec_cli.command("check")
+def spec_check_command():
+    problems, undocumented = check_apispec(build_apispec())
+    for operation in undocumented:
+        click.echo(f"Not in {OPENAPI_FILE}: {operation}")
+    for problem in problems:
+        click.echo(f"ERROR: {problem}")
+    if problems:
+        raise SystemExit(1)
+    click.echo(f"All operations in {OPENAPI_FILE} are served.")
+
 if __name__ == '__main__':
     app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,293 @@
+"""ASGI entry point with a non-blocking ``submit_code`` path.
+
+``POST /api/submit_code`` and its Server-Sent Events variant
+``POST /api/submit_code/stream`` are handled natively on the event loop: sandboxes
+run through ``asyncio.create_subprocess_exec`` and are awaited, so a single
+process can supervise hundreds of evaluations instead of pinning one worker
+thread per submission. Submissions go through the same admission control
+as the Flask routes, with ``ASYNC_SANDBOX_CONCURRENCY`` as the in-flight cap. With
+``SANDBOX_WORKERS`` set, the jobs go to the remote worker pool instead, whose
+blocking client runs on a thread executor of the same size. The result row is stored from a thread so the loop
+never blocks on a commit. Every other route is served by the Flask app
+through asgiref's WSGI adapter, on a pool of ``WSGI_THREADS`` threads.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:application
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from admission import AsyncAdmissionController, Rejected
+from app import (
+    SSE_HEADERS, app, client_key, find_problem, observe_request, record_submission, result_recorder, sandbox_pool,
+    sse_event, traffic_recorder
+)
+from sandbox import run_test_case_async
+from sandbox_pool import SandboxUnavailable
+
+# Upper bound on concurrently running submissions in this process.
+ASYNC_SANDBOX_CONCURRENCY = int(os.environ.get("ASYNC_SANDBOX_CONCURRENCY", "200"))
+
+# Threads serving the Flask routes. asgiref's adapter would otherwise run
+# every WSGI call on one shared thread, serializing all of them.
+WSGI_THREADS = int(os.environ.get("WSGI_THREADS", "32"))
+wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    # Re-wraps the plain function behind asgiref's thread-sensitive wrapper.
+    run_wsgi_app = sync_to_async(
+        WsgiToAsgiInstance.__dict__["run_wsgi_app"].func, thread_sensitive=False, executor=wsgi_executor
+    )
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+def closing(wsgi_app):
+    # asgiref never calls close() on the response iterable, which is what
+    # finishes traffic traces and runs Flask's call_on_close callbacks.
+    def run(environ, start_response):
+        iterable = wsgi_app(environ, start_response)
+        try:
+            yield from iterable
+        finally:
+            if hasattr(iterable, "close"):
+                iterable.close()
+    return run
+
+
+wsgi_application = PooledWsgiToAsgi(closing(app))
+admission = AsyncAdmissionController(
+    max_in_flight=ASYNC_SANDBOX_CONCURRENCY,
+    max_waiting=app.config["SUBMIT_MAX_WAITING"],
+    wait_timeout=app.config["SUBMIT_WAIT_TIMEOUT"],
+    rate=app.config["SUBMIT_RATE"],
+    burst=app.config["SUBMIT_BURST"]
+)
+
+# With SANDBOX_WORKERS set, jobs go to the worker pool; its blocking client runs on these threads.
+dispatch_executor = None
+if sandbox_pool is not None:
+    dispatch_executor = ThreadPoolExecutor(max_workers=ASYNC_SANDBOX_CONCURRENCY, thread_name_prefix="sandbox-dispatch")
+
+
+async def iter_cases(user_code, test_cases):
+    if sandbox_pool is None:
+        for test in test_cases:
+            yield await run_test_case_async(user_code, test)
+        return
+    loop = asyncio.get_running_loop()
+    results = sandbox_pool.iter(user_code, test_cases)
+    while True:
+        result = await loop.run_in_executor(dispatch_executor, next, results, None)
+        if result is None:
+            return
+        yield result
+
+
+def scope_client_key(scope):
+    header = app.config["SUBMIT_CLIENT_HEADER"].lower().encode()
+    value = next((v.decode("latin-1") for k, v in scope.get("headers", []) if header and k == header), None)
+    return client_key((scope.get("client") or [None])[0], value)
+
+
+async def admit(scope, send):
+    # Returns a Ticket, or None after sending a 429.
+    try:
+        return await admission.admit(scope_client_key(scope))
+    except Rejected as e:
+        await send_json(send, 429, {"description": "Too many submissions, retry later", "reason": e.reason},
+                        headers=[(b"retry-after", str(e.retry_after).encode())])
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-headers", b"Content-Type,Authorization"),
+    (b"access-control-allow-methods", b"GET,PUT,PATCH,POST,DELETE,OPTIONS"),
+]
+
+
+async def send_json(send, status, payload, headers=()):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ] + CORS_HEADERS + list(headers),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def store_submission(problem_id, results):
+    with app.app_context():
+        return record_submission(problem_id, results)
+
+
+async def read_submission(receive, send):
+    # Returns (problem_id, code, problem), or None after sending an error response.
+    try:
+        data = json.loads(await read_body(receive))
+    except ValueError:
+        data = None
+    if not isinstance(data, dict) or not data:
+        return await send_json(send, 400, {"description": "Invalid JSON"})
+    problem_id = data.get('problem_id')
+    user_code = data.get('code')
+    if not problem_id or not user_code:
+        return await send_json(send, 400, {"description": "Missing problem_id or code"})
+    problem = find_problem(problem_id)
+    if not problem:
+        return await send_json(send, 404, {"description": "Problem not found"})
+    return problem_id, user_code, problem
+
+
+async def submit_code(scope, receive, send):
+    submission = await read_submission(receive, send)
+    if submission is None:
+        return
+    problem_id, user_code, problem = submission
+    test_cases = problem.get('test_cases', [])
+    ticket = await admit(scope, send)
+    if ticket is None:
+        return
+    try:
+        with ticket:
+            results = [result async for result in iter_cases(user_code, test_cases)]
+    except SandboxUnavailable as e:
+        print(f"Sandbox unavailable: {e}")
+        return await send_json(send, 503, {"description": "No sandbox capacity available, retry later"},
+                               headers=[(b"retry-after", b"5")])
+    passed_cases = await asyncio.to_thread(store_submission, problem_id, results)
+    await send_json(send, 200, {
+        'problem_id': problem_id,
+        'results': results,
+        'passed_cases': passed_cases,
+        'total_cases': len(test_cases)
+    })
+
+
+async def submit_code_stream(scope, receive, send):
+    submission = await read_submission(receive, send)
+    if submission is None:
+        return
+    problem_id, user_code, problem = submission
+    test_cases = problem.get('test_cases', [])
+    ticket = await admit(scope, send)
+    if ticket is None:
+        return
+    headers = [(b"content-type", b"text/event-stream")] + CORS_HEADERS
+    headers += [(name.lower().encode(), value.encode()) for name, value in SSE_HEADERS.items()]
+    results = []
+    with ticket:
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        try:
+            async for result in iter_cases(user_code, test_cases):
+                event = sse_event("case", dict(result, index=len(results)))
+                results.append(result)
+                await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+        except SandboxUnavailable as e:
+            print(f"Sandbox unavailable: {e}")
+            error = sse_event("error", {"description": "No sandbox capacity available, retry later"})
+            return await send({"type": "http.response.body", "body": error.encode()})
+    passed_cases = await asyncio.to_thread(store_submission, problem_id, results)
+    summary = sse_event("summary", {
+        'problem_id': problem_id,
+        'passed_cases': passed_cases,
+        'total_cases': len(test_cases)
+    })
+    await send({"type": "http.response.body", "body": summary.encode()})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if result_recorder is not None:
+                await asyncio.to_thread(result_recorder.stop)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+NATIVE_ROUTES = {
+    "/api/submit_code": submit_code,
+    "/api/submit_code/stream": submit_code_stream,
+}
+
+
+async def observed(handler, scope, receive, send):
+    # Native routes bypass Flask's request hooks, so record their metrics here.
+    start = time.perf_counter()
+    status = {}
+
+    async def send_with_status(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_with_status)
+    finally:
+        observe_request(scope["method"], scope["path"], status.get("code", 500), time.perf_counter() - start)
+
+
+async def captured(handler, scope, receive, send):
+    # Native routes also bypass the WSGI TrafficRecorder, so record their traces here.
+    if traffic_recorder is None or not traffic_recorder.sampled():
+        return await handler(scope, receive, send)
+    body = await read_body(receive)
+    headers = dict(scope.get("headers") or [])
+    trace = traffic_recorder.start_trace(
+        scope["method"], scope["path"], scope.get("query_string", b"").decode("latin-1"),
+        headers.get(b"content-type", b"").decode("latin-1"), body
+    )
+    start = time.perf_counter()
+    status = {}
+    replayed = False
+
+    async def replay_body():
+        nonlocal replayed
+        if replayed:
+            return await receive()
+        replayed = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send_with_status(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+        await send(message)
+
+    try:
+        await handler(scope, replay_body, send_with_status)
+    finally:
+        traffic_recorder.finish(trace, status.get("code", 500), start)
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+    if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in NATIVE_ROUTES:
+        return await captured(partial(observed, NATIVE_ROUTES[scope["path"]]), scope, receive, send)
+    return await wsgi_application(scope, receive, send)
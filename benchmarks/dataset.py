@@ -0,0 +1,149 @@
+"""Generate a large benchmark dataset: a problem bank, a SQLite database with
+many result rows, wizard responses and large diagrams.
+
+    python -m benchmarks.dataset --workdir instance/bench --problems 5000 --results 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+from benchmarks.harness import REPO_ROOT
+
+TOPICS = ["arrays", "graphs", "dynamic_programming", "string_manipulation", "data_structures",
+          "hash_map", "heap", "trie", "sorting", "search"]
+LEVELS = ["entry", "intermediate", "advanced"]
+
+
+def dataset_env(workdir):
+    workdir = os.path.abspath(workdir)
+    return {
+        "DATABASE_URL": "sqlite:///" + os.path.join(workdir, "bench.db"),
+        "DIAGNOSTIC_DATA_FILE": os.path.join(workdir, "diagnostic_data.json"),
+    }
+
+
+def build_problem_bank(path, problems, seed):
+    rng = random.Random(seed)
+    with open(os.path.join(REPO_ROOT, "diagnostic_data.json")) as f:
+        base = json.load(f)
+    coding = []
+    for i in range(problems):
+        topics = rng.sample(TOPICS, 2)
+        coding.append({
+            "id": f"bench_{i}",
+            "title": f"Benchmark problem {i} ({' / '.join(topics)})",
+            "difficulty": LEVELS[i % 3],
+            "category": topics[0],
+            "topics": topics,
+            "company_context": "Generated for benchmarking",
+            "problem_statement": f"Return the input unchanged. Variant {i} about {topics[0]} and {topics[1]}.",
+            "input_format": "any JSON value",
+            "output_format": "the same JSON value",
+            "test_cases": [
+                {"input": f"case {n}", "expected": f"case {n}", "description": f"identity {n}"}
+                for n in range(3)
+            ],
+            "follow_up": ["How would this scale?"],
+        })
+    base["coding_problems"] = coding
+    base["skill_assessment"]["levels"] = {
+        level: [p["id"] for p in coding if p["difficulty"] == level] for level in LEVELS
+    }
+    with open(path, "w") as f:
+        json.dump(base, f)
+    return [p["id"] for p in coding], [q["id"] for q in base.get("system_design_questions", [])]
+
+
+def flask_cli(env, *args):
+    subprocess.run([sys.executable, "-m", "flask", "--app", "app", "db", *args],
+                   cwd=REPO_ROOT, env={**os.environ, **env}, check=True, stdout=subprocess.DEVNULL)
+
+
+def fill_database(db_path, problem_ids, question_ids, results, diagram_nodes, seed):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO coding_results (problem_id, passed, total, execution_time, created_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                (rng.choice(problem_ids), rng.randint(0, 3), 3, rng.expovariate(10),
+                 (now - timedelta(seconds=rng.randint(0, 90 * 86400))).isoformat(" "))
+                for _ in range(results)
+            ),
+        )
+        conn.executemany(
+            "INSERT INTO design_results (question_id, score, created_at) VALUES (?, ?, ?)",
+            (
+                (rng.choice(question_ids or ["sd_1"]), rng.randint(0, 1),
+                 (now - timedelta(seconds=rng.randint(0, 90 * 86400))).isoformat(" "))
+                for _ in range(results // 4)
+            ),
+        )
+        steps = conn.execute("SELECT id, scenario_id FROM steps").fetchall()
+        conn.executemany(
+            "INSERT INTO responses (scenario_id, step_id, user_response_text) VALUES (?, ?, ?)",
+            ((scenario_id, step_id, "We shard by business id and cache hot reads. " * 40)
+             for step_id, scenario_id in steps),
+        )
+        scenario_ids = [row[0] for row in conn.execute("SELECT id FROM scenarios")]
+        for scenario_id in scenario_ids:
+            diagram = {
+                "nodes": [{"id": f"n{i}", "type": "service", "x": i % 100 * 40, "y": i // 100 * 40,
+                           "label": f"Service {i}"} for i in range(diagram_nodes)],
+                "links": [{"source": f"n{i}", "target": f"n{i + 1}"} for i in range(diagram_nodes - 1)],
+            }
+            conn.execute(
+                "INSERT INTO diagram_versions (scenario_id, version, kind, body, created_at) VALUES (?, 1, 'snapshot', ?, ?)",
+                (scenario_id, json.dumps(diagram), now.isoformat(" ")),
+            )
+    conn.close()
+
+
+def ensure_dataset(workdir, problems=5000, results=1000000, diagram_nodes=5000, seed=1, force=False):
+    """Create the dataset in ``workdir`` unless one with the same parameters exists.
+
+    Returns the environment variables that point the app at it.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    manifest_path = os.path.join(workdir, "manifest.json")
+    params = {"problems": problems, "results": results, "diagram_nodes": diagram_nodes, "seed": seed}
+    env = dataset_env(workdir)
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) == params:
+                return env
+    db_path = os.path.join(workdir, "bench.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    problem_ids, question_ids = build_problem_bank(env["DIAGNOSTIC_DATA_FILE"], problems, seed)
+    flask_cli(env, "init")
+    flask_cli(env, "seed")
+    fill_database(db_path, problem_ids, question_ids, results, diagram_nodes, seed)
+    flask_cli(env, "rebuild-rollups")
+    with open(manifest_path, "w") as f:
+        json.dump(params, f)
+    return env
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the benchmark dataset.")
+    parser.add_argument("--workdir", default=os.path.join(REPO_ROOT, "instance", "bench"))
+    parser.add_argument("--problems", type=int, default=5000)
+    parser.add_argument("--results", type=int, default=1000000)
+    parser.add_argument("--diagram-nodes", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args(argv)
+    env = ensure_dataset(args.workdir, args.problems, args.results, args.diagram_nodes, args.seed, args.force)
+    for key, value in env.items():
+        print(f"{key}={value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Shared helpers for the benchmark scripts: start servers, drive load, summarize."""
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, port, env=None, workers=None):
+    """Start ``kind`` ("dev" or "prefork") on ``port`` and wait until it answers."""
+    if kind == "dev":
+        cmd = [sys.executable, "-m", "flask", "--app", "app", "run", "--port", str(port), "--no-reload"]
+    elif kind == "prefork":
+        cmd = [sys.executable, "serve.py", "--bind", f"127.0.0.1:{port}"]
+        if workers:
+            cmd += ["--workers", str(workers)]
+    else:
+        raise ValueError(f"Unknown server kind: {kind}")
+    # Load comes from one address, so per-client submit limits would answer it with 429s.
+    proc = subprocess.Popen(
+        cmd, cwd=REPO_ROOT, env={**os.environ, "SUBMIT_RATE": "0", **(env or {})},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{kind} server exited with status {proc.returncode}")
+        try:
+            status, _ = Client(base_url).request("GET", "/api/wizard/scenarios")
+            if status == 200:
+                return proc, base_url
+        except OSError:
+            time.sleep(0.2)
+    stop_server(proc)
+    raise RuntimeError(f"{kind} server did not start on port {port}")
+
+
+def stop_server(proc, timeout=30):
+    proc.terminate()
+    try:
+        proc.wait(timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+class Client:
+    """A keep-alive HTTP connection; one per load-generating thread."""
+
+    def __init__(self, base_url, timeout=60):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None, headers=None):
+        payload = None
+        headers = dict(headers or {})
+        if body is not None:
+            payload = body if isinstance(body, (bytes, str)) else json.dumps(body)
+            headers.setdefault("Content-Type", "application/json")
+        for attempt in (0, 1):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                if response.getheader("Connection", "").lower() == "close":
+                    self.close()
+                return response.status, data
+            except (http.client.HTTPException, ConnectionError):
+                # The server may close idle keep-alive connections; retry once.
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(q * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def run_load(base_url, requests, concurrency=8, duration=10.0, max_requests=None):
+    """Replay ``requests`` ((method, path, body) tuples) round-robin from
+    ``concurrency`` threads for ``duration`` seconds (or ``max_requests``).
+
+    Returns a dict with latencies (seconds), status counts, errors and the
+    achieved throughput.
+    """
+    latencies = []
+    statuses = {}
+    errors = []
+    lock = threading.Lock()
+    issued = [0]
+    stop_at = time.monotonic() + duration
+
+    def worker(offset):
+        client = Client(base_url)
+        i = offset
+        while time.monotonic() < stop_at:
+            with lock:
+                if max_requests is not None and issued[0] >= max_requests:
+                    break
+                issued[0] += 1
+            method, path, body = requests[i % len(requests)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                status, _ = client.request(method, path, body)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+        client.close()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - started
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "statuses": statuses,
+        "throughput": len(latencies) / wall if wall else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "latencies": latencies,
+    }
+
+
+def format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}ms"
@@ -0,0 +1,146 @@
+"""Replay a captured request trace (see traffic.py) against a local instance.
+
+Requests are dispatched at their original relative offsets divided by
+``--rate`` (``--rate 4`` plays a ten-minute capture in 2.5 minutes), or as
+fast as ``--concurrency`` allows with ``--rate 0``. Latency distributions
+are reported per route, with numeric path segments folded together.
+
+    python -m benchmarks.replay instance/requests.jsonl --target http://127.0.0.1:5000 --rate 2
+    python -m benchmarks.replay capture.jsonl --start prefork --rate 0 --concurrency 32
+"""
+import argparse
+import json
+import queue
+import re
+import sys
+import threading
+import time
+
+from benchmarks.harness import Client, format_ms, free_port, percentile, start_server, stop_server
+
+NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def load_capture(path, methods=None):
+    traces = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                trace = json.loads(line)
+            except ValueError:
+                continue
+            # Skip anything that is not a captured request (e.g. other JSONL files).
+            if not isinstance(trace, dict) or "method" not in trace or "path" not in trace:
+                continue
+            if methods and trace["method"] not in methods:
+                continue
+            traces.append(trace)
+    traces.sort(key=lambda t: t.get("ts", 0))
+    return traces
+
+
+def route_of(trace):
+    return f"{trace['method']} {NUMERIC_SEGMENT.sub('/{id}', trace['path'])}"
+
+
+def replay(base_url, traces, rate=1.0, concurrency=16):
+    jobs = queue.Queue(maxsize=concurrency * 4)
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        client = Client(base_url)
+        while True:
+            item = jobs.get()
+            if item is None:
+                break
+            trace, lag = item
+            path = trace["path"] + (f"?{trace['query']}" if trace.get("query") else "")
+            body = trace.get("body")
+            headers = {"Content-Type": trace["content_type"]} if trace.get("content_type") else None
+            if isinstance(body, (dict, list)):
+                body = json.dumps(body)
+            start = time.perf_counter()
+            try:
+                status, _ = client.request(trace["method"], path, body, headers)
+            except Exception:
+                status = None
+            elapsed = time.perf_counter() - start
+            with lock:
+                results.append((route_of(trace), status, elapsed, lag, trace.get("duration")))
+        client.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    started = time.monotonic()
+    origin = traces[0].get("ts", 0) if traces else 0
+    for trace in traces:
+        due = started + ((trace.get("ts", origin) - origin) / rate if rate > 0 else 0)
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        jobs.put((trace, max(time.monotonic() - due, 0.0)))
+    for _ in threads:
+        jobs.put(None)
+    for t in threads:
+        t.join()
+    return results, time.monotonic() - started
+
+
+def report(results, wall):
+    by_route = {}
+    for route, status, elapsed, lag, original in results:
+        entry = by_route.setdefault(route, {"latencies": [], "statuses": {}, "original": []})
+        entry["latencies"].append(elapsed)
+        entry["statuses"][status] = entry["statuses"].get(status, 0) + 1
+        if original is not None:
+            entry["original"].append(original)
+    print(f"{'route':<48}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'orig p95':>10}  statuses")
+    for route in sorted(by_route):
+        e = by_route[route]
+        lat = e["latencies"]
+        print(f"{route:<48}{len(lat):>7}{format_ms(percentile(lat, 0.5)):>10}{format_ms(percentile(lat, 0.95)):>10}"
+              f"{format_ms(percentile(lat, 0.99)):>10}{format_ms(percentile(e['original'], 0.95)):>10}  {e['statuses']}")
+    all_latencies = [r[2] for r in results]
+    lags = [r[3] for r in results]
+    failed = sum(1 for r in results if r[1] is None or r[1] >= 500)
+    print(f"\n{len(results)} requests in {wall:.1f}s ({len(results) / wall if wall else 0:.1f} req/s), "
+          f"p50 {format_ms(percentile(all_latencies, 0.5))}, p95 {format_ms(percentile(all_latencies, 0.95))}, "
+          f"p99 {format_ms(percentile(all_latencies, 0.99))}, failures {failed}, "
+          f"dispatch lag p99 {format_ms(percentile(lags, 0.99))}")
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay captured traffic and report latency distributions.")
+    parser.add_argument("capture", help="JSONL capture written by TRAFFIC_CAPTURE.")
+    parser.add_argument("--target", default="http://127.0.0.1:5000")
+    parser.add_argument("--start", choices=["dev", "prefork"], help="Start a local server instead of --target.")
+    parser.add_argument("--rate", type=float, default=1.0,
+                        help="Speed-up factor over the captured timing; 0 replays as fast as possible.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--methods", nargs="*", help="Only replay these HTTP methods.")
+    args = parser.parse_args(argv)
+
+    traces = load_capture(args.capture, args.methods)
+    if not traces:
+        print(f"No request traces found in {args.capture}")
+        return 1
+    proc = None
+    base_url = args.target
+    if args.start:
+        proc, base_url = start_server(args.start, free_port())
+    try:
+        results, wall = replay(base_url, traces, rate=args.rate, concurrency=args.concurrency)
+    finally:
+        if proc is not None:
+            stop_server(proc)
+    return 1 if report(results, wall) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
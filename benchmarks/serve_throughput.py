@@ -0,0 +1,50 @@
+"""Compare throughput of the Flask development server with serve.py.
+
+    python -m benchmarks.serve_throughput --duration 10 --concurrency 16
+
+Both servers run against the same database; the mix covers read endpoints
+and, with --with-submit, sandboxed ``submit_code`` requests.
+"""
+import argparse
+
+from benchmarks.harness import format_ms, free_port, run_load, start_server, stop_server
+
+READ_MIX = [
+    ("GET", "/api/wizard/scenarios", None),
+    ("GET", "/api/coding_challenges?level=intermediate", None),
+    ("GET", "/api/design_questions", None),
+    ("GET", "/api/wizard/1/summary", None),
+    ("GET", "/api/diagnostic_report", None),
+]
+
+SUBMIT = ("POST", "/api/submit_code", {"problem_id": "be_1", "code": "def solution(data):\n    return data\n"})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None, help="serve.py workers (default: CPU based)")
+    parser.add_argument("--with-submit", action="store_true", help="Include submit_code in the request mix.")
+    args = parser.parse_args(argv)
+
+    mix = READ_MIX + ([SUBMIT] if args.with_submit else [])
+    results = {}
+    for kind in ("dev", "prefork"):
+        proc, base_url = start_server(kind, free_port(), workers=args.workers)
+        try:
+            run_load(base_url, mix, concurrency=args.concurrency, duration=min(2.0, args.duration))
+            results[kind] = run_load(base_url, mix, concurrency=args.concurrency, duration=args.duration)
+        finally:
+            stop_server(proc)
+
+    print(f"{'server':<10}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>8}")
+    for kind, r in results.items():
+        print(f"{kind:<10}{r['throughput']:>10.1f}{format_ms(r['p50']):>10}{format_ms(r['p95']):>10}"
+              f"{format_ms(r['p99']):>10}{r['errors']:>8}")
+    if results["dev"]["throughput"]:
+        print(f"speedup: {results['prefork']['throughput'] / results['dev']['throughput']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Per-endpoint latency and throughput benchmarks with regression thresholds.
+
+Starts a local instance against the generated dataset (see dataset.py),
+drives each endpoint in turn and reports p50/p95/p99 latency and
+throughput. Results, including each endpoint's status mix, are compared
+with the stored baseline for the same dataset profile; the run exits
+non-zero if any endpoint's p95 grows or its throughput drops by more than
+``--threshold``, or if any request failed or returned a non-2xx status.
+
+    python -m benchmarks.suite                      # compare with baseline
+    python -m benchmarks.suite --update-baseline    # record a new baseline
+"""
+import argparse
+import json
+import os
+import sys
+
+from benchmarks.dataset import ensure_dataset
+from benchmarks.harness import REPO_ROOT, format_ms, free_port, run_load, start_server, stop_server
+
+IDENTITY_SOLUTION = "def solution(data):\n    return data\n"
+
+ENDPOINTS = {
+    "submit_code": [("POST", "/api/submit_code", {"problem_id": f"bench_{i}", "code": IDENTITY_SOLUTION})
+                    for i in range(10)],
+    "diagnostic_report": [("GET", "/api/diagnostic_report", None)],
+    "wizard_summary": [("GET", f"/api/wizard/{i}/summary", None) for i in range(1, 6)],
+    "wizard_scenarios": [("GET", "/api/wizard/scenarios", None)],
+    "wizard_steps": [("GET", f"/api/wizard/scenario/{i}/steps", None) for i in range(1, 6)],
+    "coding_challenges": [("GET", f"/api/coding_challenges?level={level}", None)
+                          for level in ("entry", "intermediate", "advanced")],
+    "coding_challenge": [("GET", "/api/coding_challenge?topic=graphs", None)],
+    "design_questions": [("GET", "/api/design_questions", None)],
+    "diagram": [("GET", f"/api/wizard/scenario/{i}/diagram", None) for i in range(1, 6)],
+    "analytics": [("GET", "/api/analytics/results?granularity=day", None)],
+}
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baselines.json")
+
+
+def profile_key(args):
+    return f"{args.server}:p{args.problems}:r{args.results}:d{args.diagram_nodes}:c{args.concurrency}"
+
+
+def status_failures(current):
+    """Endpoints with transport errors or any non-2xx response; every endpoint is expected to succeed."""
+    return [
+        f"{name}: errors {stats['errors']}, statuses {stats['statuses']}"
+        for name, stats in current.items()
+        if stats["errors"] or any(not 200 <= int(status) < 300 for status in stats["statuses"])
+    ]
+
+
+def compare(current, baseline, threshold):
+    """Return a list of human-readable regressions."""
+    failures = status_failures(current)
+    for name, stats in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base.get("p95") and stats["p95"] is not None and stats["p95"] > base["p95"] * (1 + threshold):
+            failures.append(f"{name}: p95 {format_ms(stats['p95'])} vs baseline {format_ms(base['p95'])}")
+        if base.get("throughput") and stats["throughput"] < base["throughput"] * (1 - threshold):
+            failures.append(f"{name}: {stats['throughput']:.1f} req/s vs baseline {base['throughput']:.1f} req/s")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Endpoint benchmark suite with regression thresholds.")
+    parser.add_argument("--workdir", default=os.path.join(REPO_ROOT, "instance", "bench"))
+    parser.add_argument("--problems", type=int, default=5000)
+    parser.add_argument("--results", type=int, default=1000000)
+    parser.add_argument("--diagram-nodes", type=int, default=5000)
+    parser.add_argument("--server", choices=["dev", "prefork"], default="prefork")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint.")
+    parser.add_argument("--endpoints", nargs="*", choices=sorted(ENDPOINTS), default=sorted(ENDPOINTS))
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed fractional regression of p95 latency and throughput.")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", dest="json_out", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    env = ensure_dataset(args.workdir, args.problems, args.results, args.diagram_nodes)
+    proc, base_url = start_server(args.server, free_port(), env=env, workers=args.workers)
+    current = {}
+    try:
+        for name in args.endpoints:
+            mix = ENDPOINTS[name]
+            run_load(base_url, mix, concurrency=args.concurrency, duration=min(1.0, args.duration))
+            stats = run_load(base_url, mix, concurrency=args.concurrency, duration=args.duration)
+            stats.pop("latencies")
+            current[name] = stats
+    finally:
+        stop_server(proc)
+
+    print(f"{'endpoint':<20}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>8}")
+    for name, r in current.items():
+        print(f"{name:<20}{r['throughput']:>10.1f}{format_ms(r['p50']):>10}{format_ms(r['p95']):>10}"
+              f"{format_ms(r['p99']):>10}{r['errors']:>8}")
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump(current, f, indent=2)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    key = profile_key(args)
+    if args.update_baseline:
+        # A run that was mostly 4xx would look fast and hide later regressions.
+        failures = status_failures(current)
+        if failures:
+            for failure in failures:
+                print(f"FAILED {failure}")
+            print("Baseline not written.")
+            return 1
+        baselines[key] = {**baselines.get(key, {}), **current}
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baseline '{key}' written to {args.baseline}")
+        return 0
+    if key not in baselines:
+        print(f"No baseline for '{key}'; run with --update-baseline to record one.")
+        failures = status_failures(current)
+        for failure in failures:
+            print(f"FAILED {failure}")
+        return 1 if failures else 0
+    failures = compare(current, baselines[key], args.threshold)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""Versioned, delta-based diagram storage.
+
+Each scenario's diagram is a chain of rows in one table: full ``snapshot``
+rows and ``patch`` rows holding RFC 6902 JSON Patch operations. A save
+appends one row in a single transaction, so an autosave costs as much as
+the edit rather than the whole document. Every ``snapshot_every`` patches
+the current document is written out as a new snapshot, and versions older
+than the last ``keep_snapshots`` snapshots are deleted.
+"""
+import copy
+import json
+
+from sqlalchemy.exc import IntegrityError
+
+
+class PatchError(ValueError):
+    pass
+
+
+class VersionConflict(Exception):
+    def __init__(self, current_version):
+        super().__init__(f"Diagram is at version {current_version}")
+        self.current_version = current_version
+
+
+def _parse_pointer(pointer):
+    if not isinstance(pointer, str):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise PatchError(f"Invalid JSON pointer: {pointer!r}")
+    return [part.replace("~1", "/").replace("~0", "~") for part in pointer[1:].split("/")]
+
+
+def _array_index(container, token, allow_end=False):
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise PatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _resolve(doc, tokens):
+    node = doc
+    for token in tokens:
+        if isinstance(node, list):
+            node = node[_array_index(node, token)]
+        elif isinstance(node, dict):
+            if token not in node:
+                raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+            node = node[token]
+        else:
+            raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+    return node
+
+
+def _add(doc, tokens, value):
+    if not tokens:
+        return value
+    parent = _resolve(doc, tokens[:-1])
+    if isinstance(parent, list):
+        parent.insert(_array_index(parent, tokens[-1], allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    else:
+        raise PatchError(f"Cannot add to a scalar at /{'/'.join(tokens[:-1])}")
+    return doc
+
+
+def _remove(doc, tokens):
+    if not tokens:
+        raise PatchError("Cannot remove the document root")
+    parent = _resolve(doc, tokens[:-1])
+    if isinstance(parent, list):
+        return parent.pop(_array_index(parent, tokens[-1]))
+    if isinstance(parent, dict) and tokens[-1] in parent:
+        return parent.pop(tokens[-1])
+    raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+
+
+def apply_patch(doc, operations):
+    """Return a new document with the JSON Patch ``operations`` applied."""
+    if not isinstance(operations, list):
+        raise PatchError("Patch must be a list of operations")
+    doc = copy.deepcopy(doc)
+    for op in operations:
+        if not isinstance(op, dict) or "op" not in op or "path" not in op:
+            raise PatchError(f"Malformed patch operation: {op!r}")
+        tokens = _parse_pointer(op["path"])
+        name = op["op"]
+        if name in ("add", "replace", "test") and "value" not in op:
+            raise PatchError(f"Malformed patch operation, missing 'value': {op!r}")
+        if name in ("move", "copy") and "from" not in op:
+            raise PatchError(f"Malformed patch operation, missing 'from': {op!r}")
+        if name == "add":
+            doc = _add(doc, tokens, copy.deepcopy(op.get("value")))
+        elif name == "remove":
+            _remove(doc, tokens)
+        elif name == "replace":
+            _resolve(doc, tokens)
+            if tokens:
+                _remove(doc, tokens)
+            doc = _add(doc, tokens, copy.deepcopy(op.get("value")))
+        elif name in ("move", "copy"):
+            from_tokens = _parse_pointer(op["from"])
+            if name == "move" and tokens[:len(from_tokens)] == from_tokens and tokens != from_tokens:
+                raise PatchError("Cannot move a value into one of its children")
+            value = _remove(doc, from_tokens) if name == "move" else copy.deepcopy(_resolve(doc, from_tokens))
+            doc = _add(doc, tokens, value)
+        elif name == "test":
+            if _resolve(doc, tokens) != op.get("value"):
+                raise PatchError(f"Test failed at {op['path']}")
+        else:
+            raise PatchError(f"Unknown patch operation: {name!r}")
+    return doc
+
+
+class DiagramStore:
+    def __init__(self, db, model, snapshot_every=50, keep_snapshots=2):
+        self.db = db
+        self.model = model
+        self.snapshot_every = snapshot_every
+        self.keep_snapshots = keep_snapshots
+
+    def head_version(self, scenario_id):
+        model = self.model
+        return self.db.session.query(self.db.func.max(model.version)).filter(model.scenario_id == scenario_id).scalar() or 0
+
+    def load(self, scenario_id):
+        """Return ``(version, document)``, or ``(0, None)`` if nothing is stored."""
+        model = self.model
+        snapshot = (model.query.filter_by(scenario_id=scenario_id, kind="snapshot")
+                    .order_by(model.version.desc()).first())
+        if snapshot is None:
+            return 0, None
+        doc = json.loads(snapshot.body)
+        version = snapshot.version
+        patches = (model.query.filter(model.scenario_id == scenario_id, model.version > version)
+                   .order_by(model.version.asc()).all())
+        for row in patches:
+            doc = apply_patch(doc, json.loads(row.body))
+            version = row.version
+        return version, doc
+
+    def save(self, scenario_id, document):
+        """Store ``document`` as a new snapshot version and return the version."""
+        version = self.head_version(scenario_id) + 1
+        self._append(scenario_id, version, "snapshot", document)
+        return version
+
+    def patch(self, scenario_id, base_version, operations, current=None):
+        """Apply ``operations`` on top of ``base_version``; return ``(version, document)``.
+
+        ``current`` may pass an already-loaded ``(version, document)`` pair to
+        skip reloading it. Raises ``VersionConflict`` if ``base_version`` is
+        not the head version and ``PatchError`` if the operations do not apply.
+        """
+        current_version, doc = current if current is not None else self.load(scenario_id)
+        if base_version != current_version or doc is None:
+            raise VersionConflict(current_version)
+        doc = apply_patch(doc, operations)
+        version = current_version + 1
+        if self._patches_since_snapshot(scenario_id) + 1 >= self.snapshot_every:
+            self._append(scenario_id, version, "snapshot", doc)
+        else:
+            self._append(scenario_id, version, "patch", operations)
+        return version, doc
+
+    def _patches_since_snapshot(self, scenario_id):
+        model = self.model
+        last_snapshot = (self.db.session.query(self.db.func.max(model.version))
+                         .filter(model.scenario_id == scenario_id, model.kind == "snapshot").scalar() or 0)
+        return model.query.filter(model.scenario_id == scenario_id, model.version > last_snapshot).count()
+
+    def _append(self, scenario_id, version, kind, body):
+        model = self.model
+        self.db.session.add(model(scenario_id=scenario_id, version=version, kind=kind, body=json.dumps(body)))
+        try:
+            self.db.session.flush()
+            if kind == "snapshot":
+                self._compact(scenario_id)
+            self.db.session.commit()
+        except IntegrityError:
+            # Another writer took this version number first.
+            self.db.session.rollback()
+            raise VersionConflict(self.head_version(scenario_id))
+
+    def _compact(self, scenario_id):
+        model = self.model
+        kept = (self.db.session.query(model.version)
+                .filter_by(scenario_id=scenario_id, kind="snapshot")
+                .order_by(model.version.desc()).limit(self.keep_snapshots).all())
+        if len(kept) < self.keep_snapshots:
+            return
+        oldest_kept = kept[-1][0]
+        model.query.filter(model.scenario_id == scenario_id, model.version < oldest_kept).delete()
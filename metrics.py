@@ -0,0 +1,305 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters and histograms are updated by the code being measured; gauges
+(and counters kept elsewhere, such as ``ProblemBank.reloads``) can instead
+be backed by a callback that is read at scrape time.
+
+Values are kept per process. ``Registry.render`` reports one process,
+labelled with ``pid``. Under a prefork server, a ``MultiprocessCollector``
+has every process write its samples to a shared directory about once per
+``interval``. Its ``render`` then sums them, so a scrape gives the same
+totals whichever worker answers it:
+
+- Counters and histograms include workers that have exited.
+- Gauges include only live processes.
+
+    requests = registry.counter("app_requests_total", "Requests served.", ["route"])
+    requests.inc(route="/api/submit_code")
+"""
+import fcntl
+import json
+import math
+import os
+import re
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._offset = 0
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        # A forked child starts from zero; callback counters keep the parent's count as an offset.
+        with self._lock:
+            self._values.clear()
+        if self.callback is not None and self.kind == "counter":
+            self._offset = self.callback()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        # (suffix, labels, value) triples.
+        if self.callback is not None:
+            return [("", (), self.callback() - self._offset)]
+        with self._lock:
+            return [("", tuple(zip(self.labelnames, key)), value) for key, value in sorted(self._values.items())]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total, n)) for key, (counts, total, n) in self._values.items())
+        samples = []
+        for key, (counts, total, n) in items:
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append(("_bucket", labels + (("le", format_value(bound)),), cumulative))
+            samples.append(("_sum", labels, total))
+            samples.append(("_count", labels, n))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=(), callback=None):
+        return self._register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name, documentation, labelnames=(), callback=None):
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _sorted(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda m: m.name)
+
+    def reset(self):
+        for metric in self._sorted():
+            metric.reset()
+
+    def export(self):
+        """{name: {"kind", "help", "samples": [[suffix, labels, value], ...]}}, JSON-serializable."""
+        return {
+            metric.name: {
+                "kind": metric.kind,
+                "help": metric.documentation,
+                "samples": [[suffix, [list(label) for label in labels], value]
+                            for suffix, labels, value in metric.samples()],
+            }
+            for metric in self._sorted()
+        }
+
+    def render(self):
+        pid = (("pid", str(os.getpid())),)
+        lines = []
+        for metric in self._sorted():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{format_labels(pid + labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge_exports(into, export, include_gauges=True):
+    # into: {name: {"kind", "help", "samples": {(suffix, labels): value}}}
+    for name, metric in export.items():
+        if metric["kind"] == "gauge" and not include_gauges:
+            continue
+        merged = into.setdefault(name, {"kind": metric["kind"], "help": metric["help"], "samples": {}})
+        for suffix, labels, value in metric["samples"]:
+            key = (suffix, tuple(tuple(label) for label in labels))
+            merged["samples"][key] = merged["samples"].get(key, 0) + value
+    return into
+
+
+class MultiprocessCollector:
+    PID_FILE = re.compile(r"^(\d+)\.json$")
+    ARCHIVE = "archive.json"
+    LOCK = "archive.lock"
+
+    def __init__(self, registry, directory, interval=1.0):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._spawn()
+        # Threads do not survive fork(); each prefork worker restarts from zero.
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self.registry.reset()
+        self._spawn()
+
+    def _spawn(self):
+        self._stop = threading.Event()
+        threading.Thread(target=self._run, name="metrics-writer", daemon=True).start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Error writing metrics: {e}")
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _dump(self, name, data):
+        tmp = self._path(f"{name}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self._path(name))
+
+    def _load(self, name):
+        try:
+            with open(self._path(name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write(self):
+        self._dump(f"{os.getpid()}.json", self.registry.export())
+
+    def mark_dead(self):
+        """Fold this process's counters and histograms into the archive and remove its file."""
+        self._stop.set()
+        with open(self._path(self.LOCK), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            merged = merge_exports({}, self._load(self.ARCHIVE))
+            merge_exports(merged, self.registry.export(), include_gauges=False)
+            self._dump(self.ARCHIVE, {
+                name: dict(metric, samples=[[suffix, [list(label) for label in labels], value]
+                                            for (suffix, labels), value in metric["samples"].items()])
+                for name, metric in merged.items()
+            })
+        try:
+            os.remove(self._path(f"{os.getpid()}.json"))
+        except FileNotFoundError:
+            pass
+
+    def render(self):
+        own = os.getpid()
+        merged = merge_exports({}, self.registry.export())
+        with open(self._path(self.LOCK), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH)
+            merge_exports(merged, self._load(self.ARCHIVE), include_gauges=False)
+            for name in os.listdir(self.directory):
+                match = self.PID_FILE.match(name)
+                if not match or int(match.group(1)) == own:
+                    continue
+                # Files of workers that died without mark_dead() still count, minus their gauges.
+                merge_exports(merged, self._load(name), include_gauges=pid_alive(int(match.group(1))))
+        lines = []
+        for name in sorted(merged):
+            metric = merged[name]
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['kind']}")
+            for (suffix, labels), value in sorted(metric["samples"].items(), key=sample_order):
+                lines.append(f"{name}{suffix}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def sample_order(item):
+    # Keeps histogram buckets in ascending ``le`` order within each series.
+    (suffix, labels), _ = item
+    le = dict(labels).get("le")
+    bound = math.inf if le == "+Inf" else float(le) if le is not None else 0.0
+    return (tuple(label for label in labels if label[0] != "le"), suffix != "_bucket", suffix, bound)
+
+
+registry = Registry()
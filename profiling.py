@@ -0,0 +1,130 @@
+"""On-demand request profiling.
+
+A ``RequestProfile`` runs ``cProfile`` around one request and collects the
+SQL statements it executed with their timings. ``ProfileStore`` writes each
+profile to a directory as a pair of files:
+
+- ``<id>.json``: request details, SQL timings and the top functions by
+  cumulative time
+- ``<id>.prof``: the raw ``pstats`` dump for snakeviz, ``python -m pstats``
+  and similar tools
+
+It keeps only the most recent ``keep`` profiles.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import threading
+import time
+from uuid import uuid4
+
+PROFILE_ID = re.compile(r"^\d+-[0-9a-f]{8}$")
+
+
+class RequestProfile:
+    def __init__(self, max_queries=500, max_statement=2000):
+        self.max_queries = max_queries
+        self.max_statement = max_statement
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.started = None
+        self.duration = None
+
+    def start(self):
+        # Raises ValueError if another profiler is already active in this thread.
+        self.started = time.perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration = time.perf_counter() - self.started
+
+    def add_query(self, statement, seconds):
+        self.query_count += 1
+        self.query_seconds += seconds
+        if len(self.queries) < self.max_queries:
+            self.queries.append({"statement": statement[:self.max_statement], "seconds": seconds})
+
+    def top_functions(self, limit=40):
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+class ProfileStore:
+    def __init__(self, directory, keep=50):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id():
+        return f"{int(time.time() * 1000)}-{uuid4().hex[:8]}"
+
+    def save(self, profile, details, profile_id=None):
+        """Write ``profile`` with ``details`` (method, path, status, ...) and return its id."""
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = profile_id or self.new_id()
+        record = dict(
+            details,
+            id=profile_id,
+            created_at=time.time(),
+            duration=profile.duration,
+            sql_count=profile.query_count,
+            sql_seconds=profile.query_seconds,
+            sql=sorted(profile.queries, key=lambda q: q["seconds"], reverse=True),
+            top_functions=profile.top_functions(),
+        )
+        profile.profiler.dump_stats(os.path.join(self.directory, f"{profile_id}.prof"))
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump(record, f)
+        self._prune()
+        return profile_id
+
+    def _ids(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        ids = [name[:-5] for name in names if name.endswith(".json") and PROFILE_ID.match(name[:-5])]
+        return sorted(ids, key=lambda i: int(i.split("-")[0]), reverse=True)
+
+    def _prune(self):
+        with self._lock:
+            for profile_id in self._ids()[self.keep:]:
+                for ext in (".json", ".prof"):
+                    try:
+                        os.remove(os.path.join(self.directory, profile_id + ext))
+                    except FileNotFoundError:
+                        pass
+
+    def list(self):
+        summaries = []
+        for profile_id in self._ids():
+            record = self.load(profile_id)
+            if record is None:
+                continue
+            record.pop("sql", None)
+            record.pop("top_functions", None)
+            summaries.append(record)
+        return summaries
+
+    def load(self, profile_id):
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stats_path(self, profile_id):
+        if not PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.prof")
+        return path if os.path.exists(path) else None
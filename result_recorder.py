@@ -0,0 +1,150 @@
+"""Write-behind buffering for scoring rows.
+
+``ResultRecorder`` queues rows (``CodingResult``/``DesignResult`` and friends)
+in a bounded in-memory queue and writes them from a background thread as
+batched multi-row inserts, so request handlers no longer pay for a commit.
+A batch is flushed when it reaches ``batch_size`` rows, when
+``flush_interval`` seconds have passed since its first row, or at shutdown.
+
+``on_flush(model, rows)``, if given, runs inside each batch's transaction
+before it commits, so derived tables can be kept in step with the inserts.
+
+When the queue is full, ``record`` blocks for up to ``put_timeout`` seconds
+(back-pressure) and then reports failure so the caller can fall back to a
+synchronous write instead of dropping data.
+
+A batch that fails to commit (e.g. "database is locked") is retried up to
+``max_retries`` times with exponential backoff starting at
+``retry_backoff`` seconds. If it still fails, its rows are written one at a
+time, and only rows that fail on their own are dropped and logged.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+
+
+class ResultRecorder:
+    def __init__(self, app, db, max_pending=10000, batch_size=500, flush_interval=1.0, put_timeout=2.0,
+                 on_flush=None, max_retries=5, retry_backoff=0.5):
+        self.app = app
+        self.db = db
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.on_flush = on_flush
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._stop = None
+        self._thread = None
+        atexit.register(self.stop)
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so a recorder created in a preloaded
+        # master process is (re)started lazily in each worker.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_pending)
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name="result-recorder", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def record(self, model, rows):
+        """Queue ``rows`` (dicts of column values) for insertion into ``model``.
+
+        Returns False if the buffer stayed full for ``put_timeout`` seconds;
+        rows queued before that point are still written.
+        """
+        self._ensure_started()
+        for i, row in enumerate(rows):
+            try:
+                self._queue.put((model, row), timeout=self.put_timeout)
+            except queue.Full:
+                del rows[:i]
+                return False
+        return True
+
+    def pending(self):
+        if self._pid != os.getpid():
+            return 0
+        return self._queue.qsize()
+
+    def stop(self, timeout=10.0):
+        """Flush everything still queued and stop the writer thread."""
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                self._flush(batch)
+            elif self._stop.is_set() and self._queue.empty():
+                return
+
+    def _collect(self):
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            if deadline is None:
+                timeout = 0.1 if self._stop.is_set() else self.flush_interval
+            else:
+                # Past the deadline this only drains rows that are already queued.
+                timeout = max(deadline - time.monotonic(), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                if deadline is not None or self._stop.is_set():
+                    break
+                continue
+            batch.append(item)
+            if deadline is None:
+                deadline = time.monotonic() + (0 if self._stop.is_set() else self.flush_interval)
+        return batch
+
+    def _write(self, batch):
+        by_model = {}
+        for model, row in batch:
+            by_model.setdefault(model, []).append(row)
+        with self.app.app_context():
+            try:
+                for model, rows in by_model.items():
+                    self.db.session.execute(self.db.insert(model), rows)
+                    if self.on_flush is not None:
+                        self.on_flush(model, rows)
+                self.db.session.commit()
+            except Exception:
+                self.db.session.rollback()
+                raise
+
+    def _flush(self, batch):
+        delay = self.retry_backoff
+        for attempt in range(1, self.max_retries + 2):
+            try:
+                self._write(batch)
+                return
+            except Exception as e:
+                error = e
+            if attempt > self.max_retries:
+                break
+            print(f"Error flushing {len(batch)} buffered results (attempt {attempt}), retrying in {delay:g}s: {error}")
+            time.sleep(delay)
+            delay *= 2
+        # Write row by row so one bad row cannot take the rest of the batch with it.
+        print(f"Error flushing {len(batch)} buffered results, writing them one at a time: {error}")
+        for model, row in batch:
+            try:
+                self._write([(model, row)])
+            except Exception as e:
+                print(f"Dropped buffered {model.__tablename__} row {row!r}: {e}")
@@ -0,0 +1,56 @@
+"""Background retention for the result tables.
+
+``RetentionWorker`` periodically calls a ``compact`` callable (which moves
+result rows older than the retention age into the per-day archive tables)
+and then returns freed pages to the filesystem with
+``PRAGMA incremental_vacuum``, a bounded number of pages at a time so the
+database is never locked for long.
+"""
+import os
+import threading
+
+
+def incremental_vacuum(engine, pages):
+    # Only reclaims space when the database uses auto_vacuum=INCREMENTAL,
+    # which the schema upgrade at startup enables.
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA incremental_vacuum({int(pages)})")
+
+
+class RetentionWorker:
+    def __init__(self, app, db, compact, interval=300.0, vacuum_pages=1000):
+        self.app = app
+        self.db = db
+        self.compact = compact
+        self.interval = interval
+        self.vacuum_pages = vacuum_pages
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._spawn()
+        # Threads do not survive fork(); restart in each prefork worker.
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._spawn)
+
+    def _spawn(self):
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        with self.app.app_context():
+            moved = self.compact()
+            if self.vacuum_pages:
+                incremental_vacuum(self.db.engine, self.vacuum_pages)
+        return moved
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error during result retention: {e}")
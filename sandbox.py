@@ -0,0 +1,131 @@
+"""Run submitted solutions against test cases in a separate Python process.
+
+Each test case writes the user's code plus a small harness to a temporary
+file, runs it with ``python`` and compares the JSON printed on stdout with
+the expected value. ``execute_user_code`` blocks the calling thread;
+``run_test_case_async`` awaits the subprocess instead, so one event loop
+can supervise many evaluations at once.
+
+Spawn latency, run time and timeouts are recorded in ``metrics.registry``.
+For jobs run by a remote ``sandbox_worker.py``, the API records them from
+the worker's results instead (see sandbox_pool.py).
+"""
+import asyncio
+import json
+import os
+import subprocess
+import tempfile
+import time
+
+from metrics import registry
+
+SANDBOX_SPAWN_SECONDS = registry.histogram(
+    "sandbox_spawn_seconds", "Time to start a sandbox process.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+SANDBOX_RUN_SECONDS = registry.histogram("sandbox_run_seconds", "Wall time of a sandboxed test case.")
+SANDBOX_RUNS = registry.counter("sandbox_runs_total", "Sandboxed test cases by outcome.", ["outcome"])
+
+
+def write_harness(user_code, input_data):
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as temp_file:
+        temp_file.write(user_code)
+        temp_file.write("\n")
+        temp_file.write("import json\n")
+        temp_file.write("if __name__ == '__main__':\n")
+        temp_file.write("    data = json.loads('''{}''')\n".format(json.dumps(input_data)))
+        temp_file.write("    output = solution(data)\n")
+        temp_file.write("    print(json.dumps(output))\n")
+        return temp_file.name
+
+
+def grade(test, stdout, stderr, returncode, exec_time):
+    expected = test.get('expected')
+    stdout = stdout.strip()
+    try:
+        output = json.loads(stdout)
+    except Exception:
+        output = stdout
+    return {
+        'input': test.get('input', ''),
+        'expected': expected,
+        'output': output,
+        'passed': (output == expected) and (returncode == 0),
+        'execution_time': exec_time,
+        'error': stderr.strip()
+    }
+
+
+def observe_run(result):
+    SANDBOX_RUN_SECONDS.observe(result['execution_time'])
+    if result['error'] == 'Timeout':
+        outcome = 'timeout'
+    else:
+        outcome = 'passed' if result['passed'] else 'failed'
+    SANDBOX_RUNS.inc(outcome=outcome)
+    return result
+
+
+def timed_out(test, timeout):
+    return {
+        'input': test.get('input', ''),
+        'expected': test.get('expected'),
+        'output': None,
+        'passed': False,
+        'execution_time': timeout,
+        'error': 'Timeout'
+    }
+
+
+def run_test_case(user_code, test, timeout=5, timings=None):
+    # ``timings``, if given, receives the spawn latency under "spawn_seconds".
+    temp_filename = write_harness(user_code, test.get('input', ''))
+    try:
+        start_time = time.time()
+        proc = subprocess.Popen(['python', temp_filename], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        spawn_seconds = time.time() - start_time
+        SANDBOX_SPAWN_SECONDS.observe(spawn_seconds)
+        if timings is not None:
+            timings['spawn_seconds'] = spawn_seconds
+        with proc:
+            try:
+                stdout, stderr = proc.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                return observe_run(timed_out(test, timeout))
+        exec_time = time.time() - start_time
+        return observe_run(grade(test, stdout, stderr, proc.returncode, exec_time))
+    finally:
+        os.remove(temp_filename)
+
+
+def iter_user_code(user_code, test_cases, timeout=5):
+    for test in test_cases:
+        yield run_test_case(user_code, test, timeout)
+
+
+def execute_user_code(user_code, test_cases, timeout=5):
+    return list(iter_user_code(user_code, test_cases, timeout))
+
+
+async def run_test_case_async(user_code, test, timeout=5):
+    temp_filename = write_harness(user_code, test.get('input', ''))
+    try:
+        start_time = time.time()
+        proc = await asyncio.create_subprocess_exec(
+            'python', temp_filename, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        SANDBOX_SPAWN_SECONDS.observe(time.time() - start_time)
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            return observe_run(timed_out(test, timeout))
+        exec_time = time.time() - start_time
+        return observe_run(grade(
+            test, stdout.decode(errors='replace'), stderr.decode(errors='replace'), proc.returncode, exec_time
+        ))
+    finally:
+        os.remove(temp_filename)
@@ -0,0 +1,158 @@
+"""Dispatch sandbox jobs to a pool of ``sandbox_worker.py`` daemons.
+
+``SandboxPool.iter`` leases a job to one worker at a time, starting from a
+round-robin position. A worker that is busy, unreachable or refuses the
+job is skipped. Once a lease is accepted, the worker must send something
+(a heartbeat or a result) at least every ``lease_timeout`` seconds.
+Otherwise the lease is treated as lost, and the test cases that have not
+finished are retried on another worker, up to ``max_attempts`` leases per
+job. Results already received are kept, so a retry resumes where the lost
+lease stopped.
+
+Sandbox spawn latency, run time and outcomes are recorded in this process
+from the workers' ``case`` messages, so they appear in the API's
+``/metrics`` as they do for in-process sandboxes.
+"""
+import itertools
+import socket
+import threading
+import time
+from uuid import uuid4
+
+from metrics import registry
+from sandbox import SANDBOX_SPAWN_SECONDS, observe_run
+from sandbox_worker import ProtocolError, parse_address, recv_frame, send_frame
+
+SANDBOX_DISPATCH = registry.counter(
+    "sandbox_dispatch_total", "Leases offered to sandbox workers, by outcome.", ["outcome"]
+)
+
+
+class SandboxUnavailable(Exception):
+    pass
+
+
+class LeaseLost(Exception):
+    pass
+
+
+class SandboxPool:
+    def __init__(self, addresses, lease_timeout=10.0, connect_timeout=1.0, max_attempts=3,
+                 busy_backoff=0.05, busy_wait=10.0, token=""):
+        self.addresses = list(addresses)
+        self.lease_timeout = lease_timeout
+        self.connect_timeout = connect_timeout
+        self.max_attempts = max_attempts
+        self.busy_backoff = busy_backoff
+        self.busy_wait = busy_wait
+        self.token = token
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def _connect(self, address):
+        family, sockaddr = parse_address(address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.connect_timeout)
+        try:
+            sock.connect(sockaddr)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _rotation(self):
+        with self._lock:
+            start = next(self._next) % len(self.addresses)
+        return self.addresses[start:] + self.addresses[:start]
+
+    def _lease(self, code, test_cases, timeout, job_id):
+        """Open a lease on the first worker that accepts one; return its socket.
+
+        Keeps cycling while every worker is busy, for up to ``busy_wait`` seconds.
+        """
+        deadline = time.monotonic() + self.busy_wait
+        while True:
+            for address in self._rotation():
+                try:
+                    sock = self._connect(address)
+                except OSError:
+                    SANDBOX_DISPATCH.inc(outcome="unreachable")
+                    continue
+                try:
+                    sock.settimeout(self.lease_timeout)
+                    send_frame(sock, {"type": "lease", "job_id": job_id, "code": code,
+                                      "test_cases": test_cases, "timeout": timeout, "token": self.token})
+                    reply = recv_frame(sock)
+                except (OSError, ProtocolError):
+                    reply = None
+                kind = reply.get("type") if reply else None
+                if kind == "accepted":
+                    SANDBOX_DISPATCH.inc(outcome="accepted")
+                    return sock
+                sock.close()
+                SANDBOX_DISPATCH.inc(outcome=kind or "failed")
+                if kind == "error":
+                    raise SandboxUnavailable(reply.get("message", "Sandbox worker refused the job"))
+            if time.monotonic() >= deadline:
+                raise SandboxUnavailable("No sandbox worker accepted the job")
+            time.sleep(self.busy_backoff)
+
+    def _receive(self, sock, offset):
+        # Yields (index, result) for this lease until "done"; raises LeaseLost.
+        try:
+            while True:
+                try:
+                    message = recv_frame(sock)
+                except (OSError, ProtocolError) as e:
+                    raise LeaseLost(str(e))
+                if message is None:
+                    raise LeaseLost("Sandbox worker closed the connection")
+                kind = message.get("type")
+                if kind == "case":
+                    # The worker's own metrics are not scraped, so record the run here.
+                    if message.get("spawn_seconds") is not None:
+                        SANDBOX_SPAWN_SECONDS.observe(message["spawn_seconds"])
+                    yield offset + message["index"], observe_run(message["result"])
+                elif kind == "done":
+                    return
+                elif kind != "heartbeat":
+                    raise LeaseLost(f"Unexpected message {kind!r}")
+        finally:
+            sock.close()
+
+    def iter(self, code, test_cases, timeout=5):
+        """Yield one result per test case, in order, as the workers report them."""
+        job_id = uuid4().hex
+        done = 0
+        for attempt in range(1, self.max_attempts + 1):
+            remaining = test_cases[done:]
+            if not remaining:
+                return
+            sock = self._lease(code, remaining, timeout, job_id)
+            try:
+                for _, result in self._receive(sock, done):
+                    done += 1
+                    yield result
+                if done < len(test_cases):
+                    raise LeaseLost("Sandbox worker finished early")
+                return
+            except LeaseLost as e:
+                SANDBOX_DISPATCH.inc(outcome="lost")
+                print(f"Sandbox lease {job_id} lost (attempt {attempt}): {e}")
+        raise SandboxUnavailable(f"Sandbox job {job_id} failed after {self.max_attempts} leases")
+
+    def run(self, code, test_cases, timeout=5):
+        return list(self.iter(code, test_cases, timeout))
+
+    def ping(self):
+        """{address: pong reply or None} for every worker."""
+        status = {}
+        for address in self.addresses:
+            try:
+                with self._connect(address) as sock:
+                    sock.settimeout(self.connect_timeout)
+                    send_frame(sock, {"type": "ping"})
+                    status[address] = recv_frame(sock)
+            except (OSError, ProtocolError):
+                status[address] = None
+        return status
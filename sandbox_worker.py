@@ -0,0 +1,244 @@
+"""Standalone sandbox worker daemon.
+
+Runs submitted code against test cases (see sandbox.py) on behalf of API
+nodes, so sandbox capacity can scale on separate hosts. The API dispatches
+to a pool of these workers through ``sandbox_pool.SandboxPool``.
+
+Protocol: every message is a 4-byte big-endian length followed by that
+many bytes of UTF-8 JSON. On one connection a client may send:
+
+- ``{"type": "ping"}``, answered with
+  ``{"type": "pong", "slots": n, "active": n}``.
+- ``{"type": "lease", "job_id": ..., "code": ..., "test_cases": [...],
+  "timeout": 5, "token": ...}``. The worker answers ``busy`` when all its
+  slots are taken or it is draining, or ``error`` for a bad token.
+  Otherwise it answers ``accepted`` with its ``heartbeat`` interval. While
+  the job runs it sends a ``heartbeat`` every interval and a ``case``
+  (``index``, ``result``, ``spawn_seconds``) per finished test case. It
+  finishes with ``done``.
+
+A client treats the lease as lost when nothing arrives for a few
+heartbeat intervals, and retries the remaining test cases elsewhere.
+
+    python sandbox_worker.py --listen unix:/tmp/sandbox-1.sock --slots 4
+    python sandbox_worker.py --listen tcp:0.0.0.0:7001 --token "$SANDBOX_WORKER_TOKEN"
+
+On SIGTERM/SIGINT the worker stops accepting leases, waits up to
+``--grace`` seconds for running jobs and exits.
+"""
+import argparse
+import hmac
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+from sandbox import run_test_case
+
+HEADER = struct.Struct(">I")
+MAX_FRAME = 16 * 1024 * 1024
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def send_frame(sock, message):
+    body = json.dumps(message).encode()
+    if len(body) > MAX_FRAME:
+        raise ProtocolError(f"Frame of {len(body)} bytes exceeds {MAX_FRAME}")
+    sock.sendall(HEADER.pack(len(body)) + body)
+
+
+def _recv_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            if data:
+                raise ProtocolError("Connection closed mid-frame")
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def recv_frame(sock):
+    """Return the next message, or None if the peer closed the connection."""
+    header = _recv_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ProtocolError(f"Frame of {size} bytes exceeds {MAX_FRAME}")
+    body = _recv_exactly(sock, size)
+    if body is None:
+        raise ProtocolError("Connection closed mid-frame")
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise ProtocolError(f"Invalid frame: {e}")
+
+
+def parse_address(address):
+    """``unix:/path``, ``tcp:host:port`` or ``host:port`` -> (family, sockaddr)."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    if address.startswith("tcp:"):
+        address = address[len("tcp:"):]
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Invalid sandbox worker address: {address!r}")
+    return socket.AF_INET, (host, int(port))
+
+
+class SandboxWorker:
+    def __init__(self, slots=4, heartbeat=1.0, token=""):
+        self.slots = slots
+        self.heartbeat = heartbeat
+        self.token = token
+        self.active = 0
+        self.draining = False
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def _acquire(self):
+        with self._lock:
+            if self.draining or self.active >= self.slots:
+                return False
+            self.active += 1
+            return True
+
+    def _release(self):
+        with self._lock:
+            self.active -= 1
+            self._idle.notify_all()
+
+    def drain(self, grace):
+        """Refuse new leases and wait up to ``grace`` seconds for running jobs."""
+        deadline = time.monotonic() + grace
+        with self._lock:
+            self.draining = True
+            while self.active and time.monotonic() < deadline:
+                self._idle.wait(deadline - time.monotonic())
+            return self.active == 0
+
+    def serve_connection(self, sock):
+        while True:
+            message = recv_frame(sock)
+            if message is None:
+                return
+            kind = message.get("type")
+            if kind == "ping":
+                send_frame(sock, {"type": "pong", "slots": self.slots, "active": self.active})
+            elif kind == "lease":
+                self._lease(sock, message)
+            else:
+                send_frame(sock, {"type": "error", "message": f"Unknown message type {kind!r}"})
+
+    def _lease(self, sock, message):
+        job_id = message.get("job_id")
+        if self.token and not hmac.compare_digest(str(message.get("token", "")), self.token):
+            send_frame(sock, {"type": "error", "job_id": job_id, "message": "Invalid token"})
+            return
+        if not self._acquire():
+            send_frame(sock, {"type": "busy", "job_id": job_id})
+            return
+        send_lock = threading.Lock()
+        finished = threading.Event()
+
+        def send(frame):
+            with send_lock:
+                send_frame(sock, frame)
+
+        def beat():
+            while not finished.wait(self.heartbeat):
+                try:
+                    send({"type": "heartbeat", "job_id": job_id})
+                except OSError:
+                    return
+
+        try:
+            send({"type": "accepted", "job_id": job_id, "heartbeat": self.heartbeat})
+            threading.Thread(target=beat, name=f"heartbeat-{job_id}", daemon=True).start()
+            results = []
+            timeout = message.get("timeout", 5)
+            for index, test in enumerate(message.get("test_cases", [])):
+                timings = {}
+                result = run_test_case(message.get("code", ""), test, timeout, timings)
+                results.append(result)
+                send({"type": "case", "job_id": job_id, "index": index, "result": result,
+                      "spawn_seconds": timings.get("spawn_seconds")})
+            send({"type": "done", "job_id": job_id, "results": results})
+        finally:
+            finished.set()
+            self._release()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        try:
+            self.server.worker.serve_connection(self.request)
+        except (OSError, ProtocolError) as e:
+            print(f"Sandbox connection error: {e}")
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def make_server(address, worker):
+    family, sockaddr = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(sockaddr):
+            os.remove(sockaddr)
+        server = _UnixServer(sockaddr, _Handler)
+    else:
+        server = _TCPServer(sockaddr, _Handler)
+    server.worker = worker
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run submitted code for API nodes.")
+    parser.add_argument("--listen", default=os.environ.get("SANDBOX_WORKER_LISTEN", "unix:/tmp/sandbox-worker.sock"))
+    parser.add_argument("--slots", type=int, default=int(os.environ.get("SANDBOX_WORKER_SLOTS", os.cpu_count() or 2)))
+    parser.add_argument("--heartbeat", type=float, default=float(os.environ.get("SANDBOX_WORKER_HEARTBEAT", "1.0")))
+    parser.add_argument("--token", default=os.environ.get("SANDBOX_WORKER_TOKEN", ""))
+    parser.add_argument("--grace", type=float, default=30.0, help="Seconds to let running jobs finish on shutdown.")
+    args = parser.parse_args(argv)
+
+    worker = SandboxWorker(slots=args.slots, heartbeat=args.heartbeat, token=args.token)
+    server = make_server(args.listen, worker)
+
+    def shutdown(signum, frame):
+        # serve_forever() must be stopped from another thread.
+        def stop():
+            worker.drain(args.grace)
+            server.shutdown()
+        threading.Thread(target=stop, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    print(f"Sandbox worker listening on {args.listen} with {args.slots} slots")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        family, sockaddr = parse_address(args.listen)
+        if family == socket.AF_UNIX and os.path.exists(sockaddr):
+            os.remove(sockaddr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
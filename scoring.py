@@ -0,0 +1,119 @@
+"""Rubric scoring of free-text wizard responses.
+
+``Rubric`` is built once from ``system_design_assessment.core_competencies``
+and precomputes, for every competency:
+
+- a keyword set per skill ("Read replicas" -> {read, replica}), using
+  the tokenizer and plural folding of ``search``
+- a TF-IDF term vector over the skills and evaluation criteria, with the
+  IDF taken across competencies so terms specific to one competency weigh
+  the most
+- the distinctive terms of its top ("5") criterion, e.g. trade-offs or
+  edge cases
+
+``Rubric.score`` tokenizes a response once and accumulates the cosine
+similarities through an inverted index of rubric terms, so each response
+costs one tokenization plus a lookup per rubric term it contains. Per
+competency the result has:
+
+- ``coverage``: the fraction of skills evidenced
+- ``similarity``: cosine similarity to the competency vector
+- ``score``: a 0-5 value
+- ``level``: the value mapped onto the rubric's 1/3/5 levels, or 0 when
+  there is no evidence
+
+numpy is not a dependency, so the vectors are sparse dicts.
+"""
+import hashlib
+import json
+import math
+from collections import Counter
+
+from search import STOPWORDS as SEARCH_STOPWORDS, TOKEN, stem
+
+# Bump when the scoring method changes, so stored scores are recomputed.
+SCORER_VERSION = 2
+
+# Rubric filler words, on top of the ones search ignores.
+STOPWORDS = SEARCH_STOPWORDS | frozenset("basic both clear including only vs well".split())
+
+
+def terms(text):
+    return [stem(t) for t in TOKEN.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def term_counts(text):
+    # Stems each distinct token once rather than every occurrence.
+    counts = Counter()
+    for token, n in Counter(TOKEN.findall((text or "").lower())).items():
+        if token not in STOPWORDS:
+            counts[stem(token)] += n
+    return counts
+
+
+def normalize(vector):
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {t: v / norm for t, v in vector.items()} if norm else {}
+
+
+class Rubric:
+    def __init__(self, core_competencies):
+        self.version = hashlib.sha1(
+            json.dumps([SCORER_VERSION, core_competencies], sort_keys=True).encode()
+        ).hexdigest()
+        self.competencies = {}
+        documents = {}
+        for name, spec in core_competencies.items():
+            skills = spec.get("skills", [])
+            criteria = spec.get("evaluation_criteria", {})
+            documents[name] = Counter(terms(" ".join(skills + list(criteria.values()) + [name.replace("_", " ")])))
+            top = criteria[max(criteria, key=int)] if criteria else ""
+            self.competencies[name] = {
+                "skills": [(skill, set(terms(skill))) for skill in skills],
+                "depth_terms": set(terms(top)),
+            }
+        df = Counter(t for doc in documents.values() for t in doc)
+        n = len(documents)
+        self.idf = {t: math.log(1 + n / count) for t, count in df.items()}
+        for name, doc in documents.items():
+            self.competencies[name]["vector"] = normalize({t: tf * self.idf[t] for t, tf in doc.items()})
+        # term -> competencies whose vectors contain it
+        self.postings = {}
+        for name, spec in self.competencies.items():
+            for t in spec["vector"]:
+                self.postings.setdefault(t, []).append(name)
+        # Only depth terms that some competency's criteria do not share with all others count.
+        for spec in self.competencies.values():
+            spec["depth_terms"] = {t for t in spec["depth_terms"] if df.get(t, 0) < n} or spec["depth_terms"]
+
+    def score(self, text):
+        counts = {t: n for t, n in term_counts(text).items() if t in self.idf}
+        present = counts.keys()
+        vector = normalize({t: (1 + math.log(tf)) * self.idf[t] for t, tf in counts.items()})
+        similarity = dict.fromkeys(self.competencies, 0.0)
+        for t, weight in vector.items():
+            for name in self.postings.get(t, ()):
+                similarity[name] += weight * self.competencies[name]["vector"][t]
+        result = {}
+        for name, spec in self.competencies.items():
+            matched = [skill for skill, keywords in spec["skills"] if keywords and self._evidenced(keywords, present)]
+            coverage = len(matched) / len(spec["skills"]) if spec["skills"] else 0.0
+            depth = len(spec["depth_terms"] & present) / len(spec["depth_terms"]) if spec["depth_terms"] else 0.0
+            if not matched and similarity[name] == 0:
+                score, level = 0.0, 0
+            else:
+                score = min(5.0, 1 + 4 * (0.6 * coverage + 0.25 * min(1.0, similarity[name] / 0.3) + 0.15 * depth))
+                level = 5 if score >= 4 else 3 if score >= 2.5 else 1
+            result[name] = {
+                "level": level,
+                "score": round(score, 2),
+                "coverage": round(coverage, 3),
+                "similarity": round(similarity[name], 3),
+                "skills": matched,
+            }
+        return result
+
+    @staticmethod
+    def _evidenced(keywords, present):
+        # A skill counts when at least half of its keywords appear.
+        return len(keywords & present) * 2 >= len(keywords)
@@ -0,0 +1,126 @@
+"""In-memory BM25 full-text index over the problem bank.
+
+Documents are dicts of text fields; each field's term frequencies are
+multiplied by its weight (``FIELD_WEIGHTS``), so a match in a title counts
+more than one in a problem statement. ``SearchIndex.update`` takes the full
+set of documents but only re-indexes the ones whose text changed, so
+reloading a large bank with a few edits costs a few documents' work.
+"""
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import Counter
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from how in is it of on or that the this to with".split()
+)
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "topics": 2.0,
+    "company_context": 1.0,
+    "problem_statement": 1.0,
+    "context": 1.0,
+}
+
+
+def stem(token):
+    # Folds plain plurals ("graphs" -> "graph") so they match the singular.
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [stem(t) for t in TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def field_text(value):
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value)
+    return "" if value is None else str(value)
+
+
+def fingerprint(fields):
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+
+class SearchIndex:
+    def __init__(self, k1=1.2, b=0.75, field_weights=FIELD_WEIGHTS):
+        self.k1 = k1
+        self.b = b
+        self.field_weights = field_weights
+        self.postings = {}  # term -> {doc_id: weighted term frequency}
+        self.lengths = {}  # doc_id -> weighted length
+        self.doc_terms = {}  # doc_id -> its terms, for removal
+        self.fingerprints = {}
+        self.total_length = 0.0
+        self.lock = threading.Lock()
+
+    def _terms(self, fields):
+        terms = Counter()
+        for name, weight in self.field_weights.items():
+            for token in tokenize(field_text(fields.get(name))):
+                terms[token] += weight
+        return terms
+
+    def _remove(self, doc_id):
+        for term in self.doc_terms.pop(doc_id, ()):
+            docs = self.postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id, 0.0)
+        self.fingerprints.pop(doc_id, None)
+
+    def _add(self, doc_id, fields, digest):
+        terms = self._terms(fields)
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.doc_terms[doc_id] = tuple(terms)
+        length = sum(terms.values())
+        self.lengths[doc_id] = length
+        self.total_length += length
+        self.fingerprints[doc_id] = digest
+
+    def update(self, documents):
+        """Make the index match ``documents`` ({doc_id: fields}).
+
+        Returns the number of documents (re)indexed or removed.
+        """
+        with self.lock:
+            changed = 0
+            for doc_id in set(self.fingerprints) - set(documents):
+                self._remove(doc_id)
+                changed += 1
+            for doc_id, fields in documents.items():
+                digest = fingerprint(fields)
+                if self.fingerprints.get(doc_id) == digest:
+                    continue
+                self._remove(doc_id)
+                self._add(doc_id, fields, digest)
+                changed += 1
+            return changed
+
+    def search(self, query, doc_filter=None):
+        """Return ``[(score, doc_id)]`` best first for the documents matching any query term."""
+        terms = set(tokenize(query))
+        with self.lock:
+            n = len(self.lengths)
+            if not n or not terms:
+                return []
+            avg_length = self.total_length / n or 1.0
+            scores = {}
+            for term in terms:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    if doc_filter is not None and not doc_filter(doc_id):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(((score, doc_id) for doc_id, score in scores.items()), key=lambda r: (-r[0], r[1]))
@@ -0,0 +1,100 @@
+"""Production entry point: a prefork gunicorn server for ``app``.
+
+The app is imported once in the master process (``preload_app``) so the
+problem bank, compiled templates and model-answer index are shared
+copy-on-write by every worker. Workers are recycled after a jittered number
+of requests, and on SIGTERM each worker stops accepting connections and
+finishes in-flight requests (including running ``submit_code`` sandboxes)
+for up to ``graceful_timeout`` seconds before exiting.
+
+    python serve.py --bind 0.0.0.0:5000
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+
+from gunicorn.app.base import BaseApplication
+
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance")
+
+
+def default_workers():
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def post_fork(server, worker):
+    # Connections opened by the master while preloading must not be shared.
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    # Write out any buffered scoring rows before the worker goes away, and
+    # keep its counters in the shared metrics totals.
+    from app import metrics_collector, result_recorder
+    if result_recorder is not None:
+        result_recorder.stop()
+    if metrics_collector is not None:
+        metrics_collector.mark_dead()
+
+
+class DiagnosticsServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import app
+        return app
+
+
+def build_options(args):
+    return {
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": args.worker_class,
+        "threads": args.threads,
+        "preload_app": True,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": max(args.max_requests // 10, 1),
+        "graceful_timeout": args.graceful_timeout,
+        "timeout": args.timeout,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+        "accesslog": args.access_log,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the diagnostics API with prefork workers.")
+    parser.add_argument("--bind", default=os.environ.get("SERVE_BIND", "0.0.0.0:5000"))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SERVE_WORKERS", default_workers())),
+                        help="Worker processes (default: 2 x CPU count + 1).")
+    parser.add_argument("--worker-class", default=os.environ.get("SERVE_WORKER_CLASS", "sync"))
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("SERVE_THREADS", "1")),
+                        help="Threads per worker (used by the gthread worker class).")
+    parser.add_argument("--max-requests", type=int, default=int(os.environ.get("SERVE_MAX_REQUESTS", "1000")),
+                        help="Recycle a worker after roughly this many requests.")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.environ.get("SERVE_GRACEFUL_TIMEOUT", "60")),
+                        help="Seconds a stopping worker may spend draining in-flight requests.")
+    parser.add_argument("--timeout", type=int, default=int(os.environ.get("SERVE_TIMEOUT", "120")),
+                        help="Seconds before a silent worker is killed and replaced.")
+    parser.add_argument("--access-log", default=os.environ.get("SERVE_ACCESS_LOG"))
+    parser.add_argument("--metrics-dir", default=os.environ.get("METRICS_DIR", os.path.join(INSTANCE_DIR, "metrics")),
+                        help="Directory where workers share metrics so /metrics reports totals across them.")
+    args = parser.parse_args(argv)
+    # Start from empty totals; files left by a previous run could reuse live pids.
+    shutil.rmtree(args.metrics_dir, ignore_errors=True)
+    os.makedirs(args.metrics_dir)
+    os.environ["METRICS_DIR"] = os.path.abspath(args.metrics_dir)
+    DiagnosticsServer(build_options(args)).run()
+
+
+if __name__ == "__main__":
+    main()
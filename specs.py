@@ -0,0 +1,63 @@
+"""Pre-encoded OpenAPI spec and a contract check against ``openapi.yaml``.
+
+The spec is generated from the view docstrings once, at startup or by
+``flask spec build``. ``EncodedSpec`` holds it as JSON bytes (plus a gzip
+copy) with content-derived ETags, so serving it costs a header comparison
+and a write.
+
+``check_contract`` reports the operations documented in ``openapi.yaml``
+that the generated spec is missing. ``openapi.yaml`` is relative to its
+``basePath``, and the generated paths are absolute.
+"""
+import gzip
+import hashlib
+import json
+
+import yaml
+
+HTTP_METHODS = {"get", "put", "post", "patch", "delete", "head", "options"}
+
+
+class EncodedSpec:
+    def __init__(self, spec):
+        self.body = json.dumps(spec, sort_keys=True, separators=(",", ":")).encode()
+        self.gzipped = gzip.compress(self.body, mtime=0)
+        self.etag = hashlib.sha256(self.body).hexdigest()[:32]
+        # Each representation needs its own strong ETag (RFC 9110 8.8.3).
+        self.gzip_etag = self.etag + "-gz"
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+
+def operations(paths, prefix=""):
+    # {(path, method)}
+    prefix = prefix.rstrip("/")
+    return {
+        (prefix + path, method.lower())
+        for path, item in (paths or {}).items()
+        for method in (item or {})
+        if method.lower() in HTTP_METHODS
+    }
+
+
+def load_contract(path):
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def check_contract(spec, contract):
+    """Return ``(problems, undocumented)``.
+
+    ``problems`` lists contract operations that are missing from ``spec``.
+    ``undocumented`` lists generated operations that the contract does not
+    mention.
+    """
+    generated = operations(spec.get("paths"))
+    documented = operations(contract.get("paths"), contract.get("basePath", ""))
+    problems = [f"{method.upper()} {path} is in the contract but not served"
+                for path, method in sorted(documented - generated)]
+    undocumented = [f"{method.upper()} {path}" for path, method in sorted(generated - documented)]
+    return problems, undocumented
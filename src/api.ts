@@ -92,6 +92,66 @@ export const submitCodingSolution = async (
   return response.data;
 };
 
+export interface TestCaseResult {
+  index: number;
+  input: any;
+  expected: any;
+  output: any;
+  passed: boolean;
+  execution_time: number;
+  error: string;
+}
+
+export interface SubmissionSummary {
+  problem_id: string;
+  passed_cases: number;
+  total_cases: number;
+}
+
+// Streams one Server-Sent Event per finished test case, then a summary event.
+export const submitCodingSolutionStream = async (
+  problem_id: string,
+  code: string,
+  onCase: (result: TestCaseResult) => void
+): Promise<SubmissionSummary> => {
+  const response = await fetch(`${API_BASE}/submit_code/stream`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ problem_id, code }),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Submission failed with status ${response.status}`);
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let summary: SubmissionSummary | null = null;
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let eventName = "message";
+      const dataLines: string[] = [];
+      for (const line of rawEvent.split("\n")) {
+        if (line.startsWith("event:")) eventName = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLines.push(line.slice(5).trim());
+      }
+      if (!dataLines.length) continue;
+      const payload = JSON.parse(dataLines.join("\n"));
+      if (eventName === "case") onCase(payload);
+      else if (eventName === "summary") summary = payload;
+    }
+  }
+  if (!summary) {
+    throw new Error("Submission stream ended without a summary");
+  }
+  return summary;
+};
+
 export const fetchDesignQuestions = async (): Promise<DesignQuestion[]> => {
   const response = await axios.get(`${API_BASE}/design_questions`);
   return response.data;
@@ -18,7 +18,7 @@ import {
 import { MdArrowForward } from "react-icons/md";
 import {
   fetchCodingChallenge,
-  submitCodingSolution,
+  submitCodingSolutionStream,
   CodingProblem,
 } from "../api";
 import "ace-builds/src-noconflict/mode-python";
@@ -40,9 +40,12 @@ const CodeChallenge: React.FC<{ problem: CodingProblem }> = ({ problem }) => {
   const handleSubmit = async () => {
     if (problem) {
       setLoading(true);
+      setResult({ problem_id: problem.id, results: [] });
       try {
-        const res = await submitCodingSolution(problem.id, code);
-        setResult(res);
+        const summary = await submitCodingSolutionStream(problem.id, code, (caseResult) =>
+          setResult((prev: any) => ({ ...prev, results: [...prev.results, caseResult] }))
+        );
+        setResult((prev: any) => ({ ...prev, ...summary }));
         toast({
           title: "Solution submitted",
           status: "success",
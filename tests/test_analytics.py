@@ -0,0 +1,23 @@
+from datetime import datetime
+
+import pytest
+from werkzeug.exceptions import BadRequest
+
+from app import app, parse_timestamp
+
+
+def test_parse_timestamp_converts_offsets_to_naive_utc():
+    with app.test_request_context():
+        assert parse_timestamp("2024-03-01T12:30:00+02:00", "since") == datetime(2024, 3, 1, 10, 30)
+        assert parse_timestamp("2024-03-01T12:30:00Z", "since") == datetime(2024, 3, 1, 12, 30)
+
+
+def test_parse_timestamp_keeps_naive_values():
+    with app.test_request_context():
+        assert parse_timestamp("2024-03-01T12:30:00", "since") == datetime(2024, 3, 1, 12, 30)
+        assert parse_timestamp(None, "since") is None
+
+
+def test_parse_timestamp_rejects_garbage():
+    with app.test_request_context(), pytest.raises(BadRequest):
+        parse_timestamp("yesterday", "since")
@@ -0,0 +1,30 @@
+import pytest
+
+from diagram_store import PatchError, apply_patch
+
+DOC = {"nodes": [{"id": "a"}], "links": []}
+
+
+def test_apply_patch_add_and_move():
+    doc = apply_patch(DOC, [
+        {"op": "add", "path": "/nodes/-", "value": {"id": "b"}},
+        {"op": "move", "from": "/nodes/0", "path": "/links/0"},
+    ])
+    assert doc == {"nodes": [{"id": "b"}], "links": [{"id": "a"}]}
+    assert DOC == {"nodes": [{"id": "a"}], "links": []}
+
+
+@pytest.mark.parametrize("op", [
+    {"op": "add", "path": 5, "value": 1},
+    {"op": "add", "path": None, "value": 1},
+    {"op": "remove", "path": ["nodes"]},
+    {"op": "add", "path": "/nodes/-"},
+    {"op": "move", "path": "/links/0"},
+    {"op": "copy", "from": None, "path": "/links/0"},
+    {"op": "replace", "path": "nodes", "value": []},
+    {"path": "/nodes"},
+    "add",
+])
+def test_apply_patch_rejects_malformed_operations(op):
+    with pytest.raises(PatchError):
+        apply_patch(DOC, [op])
@@ -0,0 +1,19 @@
+from app import app, has_admin_token
+
+
+def test_admin_token_accepts_matching_header(monkeypatch):
+    monkeypatch.setitem(app.config, "PROFILE_TOKEN", "s3cret")
+    with app.test_request_context(headers={"X-Profile-Token": "s3cret"}):
+        assert has_admin_token()
+
+
+def test_admin_token_rejects_non_ascii_header(monkeypatch):
+    monkeypatch.setitem(app.config, "PROFILE_TOKEN", "s3cret")
+    with app.test_request_context(headers={"X-Profile-Token": "s3crét"}):
+        assert not has_admin_token()
+
+
+def test_admin_token_disabled_without_config(monkeypatch):
+    monkeypatch.setitem(app.config, "PROFILE_TOKEN", "")
+    with app.test_request_context(headers={"X-Profile-Token": ""}):
+        assert not has_admin_token()
@@ -0,0 +1,146 @@
+"""Opt-in capture of sanitized request traces to JSONL.
+
+``TrafficRecorder`` wraps a WSGI app and appends one JSON line per request:
+timestamp, method, path, query string, content type, (sanitized) body,
+response status and duration. Only the content type is kept from the
+request headers. Query parameters, form fields and JSON body fields whose
+names look like credentials are redacted. Any other body, or one larger
+than ``max_body``, is replaced by ``body_omitted`` with its size and
+SHA-256. ``benchmarks/replay.py`` plays a capture back against an instance.
+The native routes in asgi.py bypass the WSGI app and record their traces
+through ``start_trace``/``finish``.
+
+Each line is written with a single ``write`` on an ``O_APPEND`` descriptor,
+so several worker processes can share one capture file.
+"""
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode
+
+SENSITIVE_KEY = re.compile(r"pass(word)?|secret|token|authorization|api[_-]?key|cookie|session", re.I)
+REDACTED = "[REDACTED]"
+
+
+def sanitize(value):
+    if isinstance(value, dict):
+        return {k: REDACTED if SENSITIVE_KEY.search(str(k)) else sanitize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [sanitize(v) for v in value]
+    return value
+
+
+def sanitize_query(query):
+    pairs = parse_qsl(query, keep_blank_values=True)
+    return urlencode([(k, REDACTED if SENSITIVE_KEY.search(k) else v) for k, v in pairs])
+
+
+class TrafficRecorder:
+    def __init__(self, wsgi_app, path, sample_rate=1.0, max_body=65536):
+        self.wsgi_app = wsgi_app
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_body = max_body
+        self._fd = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def sampled(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def start_trace(self, method, path, query, content_type, body):
+        trace = {
+            "ts": time.time(),
+            "method": method,
+            "path": path,
+            "query": sanitize_query(query) if query else "",
+            "content_type": content_type or None,
+        }
+        trace["body"], omitted = self._body_for_trace(body, content_type or "")
+        if omitted:
+            trace["body_omitted"] = omitted
+        return trace
+
+    def finish(self, trace, status, start):
+        trace.update(status=status, duration=time.perf_counter() - start)
+        self._write(trace)
+
+    def __call__(self, environ, start_response):
+        if not self.sampled():
+            return self.wsgi_app(environ, start_response)
+        body = self._buffer_body(environ)
+        trace = self.start_trace(
+            environ.get("REQUEST_METHOD"), environ.get("PATH_INFO"), environ.get("QUERY_STRING", ""),
+            environ.get("CONTENT_TYPE"), body
+        )
+        start = time.perf_counter()
+        status_holder = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            status_holder["status"] = int(status.split(" ", 1)[0])
+            return start_response(status, headers, exc_info)
+
+        try:
+            iterable = self.wsgi_app(environ, capture_start_response)
+        except Exception:
+            self.finish(trace, 500, start)
+            raise
+        # Finishes once the response body has been sent, so streamed
+        # responses are timed to their last byte.
+        return _ClosingIterator(iterable, lambda: self.finish(trace, status_holder.get("status"), start))
+
+    def _buffer_body(self, environ):
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        body = environ["wsgi.input"].read(length) if length > 0 else b""
+        environ["wsgi.input"] = io.BytesIO(body)
+        return body
+
+    def _body_for_trace(self, body, content_type):
+        # (body, omitted): a sanitized body, or a placeholder for one that cannot be redacted.
+        if not body:
+            return None, None
+        if len(body) <= self.max_body:
+            if "json" in content_type:
+                try:
+                    return sanitize(json.loads(body)), None
+                except ValueError:
+                    pass
+            elif "application/x-www-form-urlencoded" in content_type:
+                return sanitize_query(body.decode("utf-8", errors="replace")), None
+        return None, {"size": len(body), "sha256": hashlib.sha256(body).hexdigest()}
+
+    def _write(self, trace):
+        line = (json.dumps(trace) + "\n").encode()
+        try:
+            with self._lock:
+                if self._fd is None or self._pid != os.getpid():
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+                    self._pid = os.getpid()
+                os.write(self._fd, line)
+        except OSError as e:
+            print(f"Error writing traffic capture: {e}")
+
+
+class _ClosingIterator:
+    def __init__(self, iterable, on_close):
+        self.iterable = iterable
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.iterable)
+
+    def close(self):
+        try:
+            if hasattr(self.iterable, "close"):
+                self.iterable.close()
+        finally:
+            self.on_close()